@@ -1,8 +1,7 @@
-from youtube_comment_downloader import YoutubeCommentDownloader
-import pandas as pd
 import time
 from concurrent.futures import ThreadPoolExecutor
-import re
+from fetcher import SessionPool
+from classify import mixed_batch, mixed_type_batch, load_keywords, MIXED_PATTERNS_FILE
 
 # Configuration
 VIDEO_IDS = [
@@ -26,44 +25,27 @@ VIDEO_IDS = [
 MAX_COMMENTS_PER_VIDEO = 2000
 OUTPUT_FILE = "all_mixed_comments.csv"
 
+# Tanglish patterns (English script with Tamil-like words, see mixed_patterns.txt)
+MIXED_PATTERNS = load_keywords(MIXED_PATTERNS_FILE)
+
+# Shared by the scraping threads, so each video reuses a warm HTTP session
+SESSIONS = SessionPool()
+
 def scrape_video_comments(video_id):
     """Scrape all comments from a single video"""
-    downloader = YoutubeCommentDownloader()
     comments = []
 
     try:
-        for i, comment in enumerate(downloader.get_comments(video_id)):
-            if i >= MAX_COMMENTS_PER_VIDEO:
-                break
-            comments.append(comment['text'].strip())
+        with SESSIONS.session() as downloader:
+            for i, comment in enumerate(downloader.get_comments(video_id)):
+                if i >= MAX_COMMENTS_PER_VIDEO:
+                    break
+                comments.append(comment['text'].strip())
         return (video_id, comments)
     except Exception as e:
         print(f"Failed on {video_id}: {str(e)}")
         return (video_id, [])
 
-def is_mixed_content(text):
-    """Detects both code-switching AND Tanglish"""
-    # Tamil Unicode detection
-    has_tamil = any(0x0B80 <= ord(c) <= 0x0BFF for c in text)
-
-    # English detection (basic)
-    has_english = any(c.isalpha() and ord(c) < 128 for c in text)
-
-    # Tanglish patterns (English script with Tamil-like words)
-    tanglish_patterns = [
-        r"\bsuper\b.*\bsir\b",  # "super sir"
-        r"\bthanks\b.*\banna\b", # "thanks anna"
-        r"\bvideo\b.*\brocks\b", # "video rocks"
-        r"\blatest\b.*\bvideo\b", # "latest video"
-        r"\bnalla\b",            # "nalla" (good in Tamil)
-        r"\bthala\b",            # "thala" (leader)
-        r"\bvaruma\b",           # "varuma" (will come)
-    ]
-
-    is_tanglish = any(re.search(pattern, text, re.IGNORECASE) for pattern in tanglish_patterns)
-
-    return (has_tamil and has_english) or is_tanglish
-
 def main():
     start_time = time.time()
 
@@ -71,19 +53,20 @@ def main():
     print(f"Scraping {len(VIDEO_IDS)} videos...")
     with ThreadPoolExecutor(max_workers=4) as executor:
         results = list(executor.map(scrape_video_comments, VIDEO_IDS))
+    print(SESSIONS)
 
     # Phase 2: Enhanced filtering
     all_mixed_comments = []
     for video_id, comments in results:
-        filtered = [c for c in comments if is_mixed_content(c)]
+        filtered = [c for c, mixed in zip(comments, mixed_batch(comments, MIXED_PATTERNS)) if mixed]
         print(f"{video_id}: {len(filtered)}/{len(comments)} mixed comments")
         all_mixed_comments.extend(filtered)
 
-    # Save with comment type classification
+    # Save with comment type classification (pandas is only needed here, so it loads here)
+    import pandas as pd
     df = pd.DataFrame({
         "text": all_mixed_comments,
-        "type": ["tamil_english" if any(0x0B80 <= ord(c) <= 0x0BFF for c in text)
-                else "tanglish" for text in all_mixed_comments]
+        "type": mixed_type_batch(all_mixed_comments)
     })
     df.to_csv(OUTPUT_FILE, index=False)
 
@@ -0,0 +1,235 @@
+"""Archive the raw comments the scrapers fetch, and reclassify them offline
+
+    python scra.py --archive                      # or rescrap.py --archive
+    python archive.py stats
+    python archive.py reclassify [--classifier scra|rescrap] [--output-dir reclassified]
+
+Batch files only keep stripped text and a label, and scra.py drops
+non-Tamil comments altogether, so changing the classification rules used to
+mean scraping again. With --archive, every video fetch's raw comment dicts
+(as youtube_comment_downloader returns them) are stored as JSON lines,
+zstd-compressed and addressed by the SHA-256 of their content, so an
+identical fetch is stored once. Objects are appended to pack files in
+raw_archive/ that are never rewritten; index.db (SQLite) maps each digest to
+its place in a pack and lists every video's fetches.
+
+reclassify reads the archive back at disk speed, runs a scraper's
+classify_chunk over it in worker processes and writes batch files to
+--output-dir, without touching the network. A video's comments from all of
+its fetches (resumed and --since-last-run ones) are merged by comment ID.
+Export them with `python export.py out.csv 'reclassified/*.parquet'`.
+"""
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import pyarrow as pa
+from metrics import METRICS
+from pipeline import ignore_signals, CHUNK_COMMENTS, CLASSIFY_WORKERS
+from writer import StreamingParquetWriter, BATCH_SCHEMA, comment_table
+
+# Configuration
+ARCHIVE_DIR = "raw_archive"
+RECLASSIFIED_DIR = "reclassified"
+PACK_BYTES = 256 * 2**20  # A new pack file is started once the current one is this large
+COMPRESSION_LEVEL = 3     # zstd level for archived objects
+CLASSIFIERS = ("scra", "rescrap")
+
+
+def _pack_name(number):
+    return f"pack_{number:05d}.zst"
+
+
+class RawArchive:
+    """Content-addressed, append-only store of raw comment payloads, one object per video fetch.
+
+    add() is called from the pipeline's writer thread; reading is for offline
+    tools. Bytes appended to a pack without an index row (a crash in between)
+    are never referenced and do no harm."""
+
+    def __init__(self, path=ARCHIVE_DIR, compression_level=COMPRESSION_LEVEL):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.codec = pa.Codec("zstd", compression_level=compression_level)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(path, "index.db"), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS objects (
+                digest   TEXT PRIMARY KEY,
+                pack     INTEGER NOT NULL,
+                offset   INTEGER NOT NULL,
+                length   INTEGER NOT NULL,
+                size     INTEGER NOT NULL,
+                comments INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS fetches (
+                id       INTEGER PRIMARY KEY,
+                video_id TEXT NOT NULL,
+                digest   TEXT NOT NULL,
+                scraped  TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS fetches_video ON fetches (video_id);
+        """)
+        self.pack = self.db.execute("SELECT MAX(pack) FROM objects").fetchone()[0] or 1
+        self.readers = {}
+
+    def add(self, video_id, comments, scraped=None):
+        """Store one fetch's raw comment dicts; returns their digest (None for an empty fetch)"""
+        if not comments:
+            return None
+        data = "".join(json.dumps(comment, ensure_ascii=False, sort_keys=True, separators=(",", ":")) + "\n"
+                       for comment in comments).encode()
+        digest = hashlib.sha256(data).hexdigest()
+        scraped = (scraped or datetime.now()).isoformat()
+        with self.lock, self.db:
+            if self.db.execute("SELECT 1 FROM objects WHERE digest = ?", (digest,)).fetchone():
+                METRICS.inc("archive_objects_total", outcome="duplicate")
+            else:
+                blob = self.codec.compress(data, asbytes=True)
+                pack_path = os.path.join(self.path, _pack_name(self.pack))
+                if os.path.exists(pack_path) and os.path.getsize(pack_path) >= PACK_BYTES:
+                    self.pack += 1
+                    pack_path = os.path.join(self.path, _pack_name(self.pack))
+                with open(pack_path, "ab") as f:
+                    offset = f.tell()
+                    f.write(blob)
+                self.db.execute("INSERT INTO objects VALUES (?, ?, ?, ?, ?, ?)",
+                                (digest, self.pack, offset, len(blob), len(data), len(comments)))
+                METRICS.inc("archive_objects_total", outcome="new")
+                METRICS.inc("archive_bytes_total", len(blob))
+            self.db.execute("INSERT INTO fetches (video_id, digest, scraped) VALUES (?, ?, ?)",
+                            (video_id, digest, scraped))
+        return digest
+
+    def _read(self, pack, offset, length, size):
+        reader = self.readers.get(pack)
+        if reader is None:
+            reader = self.readers[pack] = open(os.path.join(self.path, _pack_name(pack)), "rb")
+        reader.seek(offset)
+        data = self.codec.decompress(reader.read(length), decompressed_size=size, asbytes=True)
+        return [json.loads(line) for line in data.splitlines()]
+
+    def load(self, digest):
+        """The comment dicts stored under `digest`"""
+        row = self.db.execute("SELECT pack, offset, length, size FROM objects WHERE digest = ?", (digest,)).fetchone()
+        if row is None:
+            raise KeyError(digest)
+        return self._read(*row)
+
+    def videos(self):
+        """(video_id, comments, latest scrape time) for every archived video.
+
+        Comments from all of a video's fetches are merged by comment ID, the
+        latest fetch's copy winning; they keep the order they were first seen in."""
+        rows = self.db.execute("SELECT f.video_id, f.scraped, o.pack, o.offset, o.length, o.size "
+                               "FROM fetches f JOIN objects o USING (digest) ORDER BY f.video_id, f.id")
+        video_id, merged, scraped = None, {}, None
+        for vid, fetched, *location in rows:
+            if vid != video_id:
+                if video_id is not None:
+                    yield video_id, list(merged.values()), datetime.fromisoformat(scraped)
+                video_id, merged = vid, {}
+            scraped = fetched
+            for comment in self._read(*location):
+                merged[comment.get("cid") or len(merged)] = comment
+        if video_id is not None:
+            yield video_id, list(merged.values()), datetime.fromisoformat(scraped)
+
+    def stats(self):
+        """{"videos", "fetches", "objects", "comments", "raw_bytes", "stored_bytes", "packs"}"""
+        objects, comments, raw, stored, packs = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(comments), 0), COALESCE(SUM(size), 0), COALESCE(SUM(length), 0), "
+            "COUNT(DISTINCT pack) FROM objects").fetchone()
+        videos, fetches = self.db.execute("SELECT COUNT(DISTINCT video_id), COUNT(*) FROM fetches").fetchone()
+        return {"videos": videos, "fetches": fetches, "objects": objects, "comments": comments,
+                "raw_bytes": raw, "stored_bytes": stored, "packs": packs}
+
+    def close(self):
+        for reader in self.readers.values():
+            reader.close()
+        self.readers = {}
+        self.db.close()
+
+
+def reclassify(archive, classify_chunk, output_dir=RECLASSIFIED_DIR, workers=CLASSIFY_WORKERS,
+               chunk_comments=CHUNK_COMMENTS):
+    """Classify every archived video again and write batch files to `output_dir`; returns {type: count}.
+
+    `classify_chunk` is a scraper's (see pipeline.run_pipeline); chunks of
+    about `chunk_comments` comments go to `workers` processes, at most two
+    per worker at a time, so memory stays bounded whatever the archive's size.
+    Each run writes a new file named after the classifier's module and the
+    time, with the date last so compact.py --by-date still reads it; an
+    existing file is never overwritten."""
+    os.makedirs(output_dir, exist_ok=True)
+    now = datetime.now()
+    path = os.path.join(output_dir, f"batch_reclassified_{classify_chunk.__module__}_{now.strftime('%H%M%S')}_"
+                                    f"{now.strftime('%Y%m%d')}.parquet")
+    if os.path.exists(path):
+        raise FileExistsError(f"{path} already exists")
+    counts = {}
+    pending = []
+
+    def write(future, videos, writer):
+        for (video_id, types), (_, comments, scraped) in zip(future.result(), videos):
+            writer.write(comment_table(video_id, comments, types, scraped))
+            for type_name in types:
+                if type_name is not None:
+                    counts[type_name] = counts.get(type_name, 0) + 1
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=ignore_signals) as pool, \
+            StreamingParquetWriter(path, schema=BATCH_SCHEMA) as writer:
+        chunk, size = [], 0
+        for video in archive.videos():
+            chunk.append(video)
+            size += len(video[1])
+            if size >= chunk_comments:
+                pending.append((pool.submit(classify_chunk, [(vid, [c['text'].strip() for c in comments])
+                                                             for vid, comments, _ in chunk]), chunk))
+                chunk, size = [], 0
+                while len(pending) >= 2 * workers:
+                    write(*pending.pop(0), writer)
+        if chunk:
+            pending.append((pool.submit(classify_chunk, [(vid, [c['text'].strip() for c in comments])
+                                                         for vid, comments, _ in chunk]), chunk))
+        for future, videos in pending:
+            write(future, videos, writer)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("stats", "reclassify"))
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    parser.add_argument("--classifier", choices=CLASSIFIERS, default="scra",
+                        help="reclassify: whose rules to apply (scra.py keeps Tamil comments only)")
+    parser.add_argument("--output-dir", default=RECLASSIFIED_DIR, help="reclassify: where batch files go")
+    args = parser.parse_args()
+
+    archive = RawArchive(args.archive_dir)
+    try:
+        if args.command == "stats":
+            stats = archive.stats()
+            print(f"🗄️ {stats['videos']:,} videos, {stats['fetches']:,} fetches, {stats['comments']:,} comments "
+                  f"in {stats['objects']:,} objects | {stats['raw_bytes'] / 2**20:.1f} MiB raw, "
+                  f"{stats['stored_bytes'] / 2**20:.1f} MiB in {stats['packs']} packs")
+        else:
+            # The scraper's module-level classify_chunk, so the worker processes can import it
+            classify_chunk = importlib.import_module(args.classifier).classify_chunk
+            counts = reclassify(archive, classify_chunk, args.output_dir)
+            print(f"✅ Reclassified into {args.output_dir}/:")
+            for type_name, count in sorted(counts.items(), key=lambda item: -item[1]):
+                print(f"{type_name:<12} {count}")
+    finally:
+        archive.close()
+
+
+if __name__ == "__main__":
+    main()
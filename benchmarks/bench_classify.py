@@ -0,0 +1,84 @@
+"""Compare per-comment classification with the batch API on the comment_data corpus
+
+    python benchmarks/bench_classify.py [--limit N]
+"""
+import argparse
+import glob
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from classify import classify_batch, mixed_batch, KeywordMatcher
+from rescrap import classify_comment, OUTPUT_DIR, TANGLISH_KEYWORDS
+from app import MIXED_PATTERNS
+
+
+def is_mixed_content(text):
+    """app.py's original per-comment filter, the reference mixed_batch is checked against"""
+    # Tamil Unicode detection
+    has_tamil = any(0x0B80 <= ord(c) <= 0x0BFF for c in text)
+
+    # English detection (basic)
+    has_english = any(c.isalpha() and ord(c) < 128 for c in text)
+
+    is_tanglish = MIXED_PATTERNS.search(text)
+
+    return (has_tamil and has_english) or is_tanglish
+
+
+def load_texts(limit=None):
+    """Read the text column of every batch file"""
+    chunks = [pq.read_table(path, columns=["text"])["text"] for path in sorted(glob.glob(os.path.join(OUTPUT_DIR, "*.parquet")))]
+    texts = pa.chunked_array([c for chunk in chunks for c in chunk.chunks], type=pa.string()).combine_chunks()
+    return texts.slice(0, limit) if limit is not None else texts
+
+
+def timed(label, n, fn):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed:8.2f}s  {n / elapsed:>12,.0f} comments/sec")
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--limit", type=int, default=None, help="only use the first N comments")
+    args = parser.parse_args()
+
+    texts = load_texts(args.limit)
+    as_list = texts.to_pylist()
+    n = len(as_list)
+    if not n:
+        sys.exit(f"No comments to benchmark in {OUTPUT_DIR}/*.parquet")
+    print(f"Corpus: {n:,} comments from {OUTPUT_DIR}/\n")
+
+    scalar, t_scalar = timed("classify_comment (loop)", n, lambda: [classify_comment(t) for t in as_list])
+    batch, t_batch = timed("classify_batch", n, lambda: classify_batch(texts, TANGLISH_KEYWORDS))
+    if scalar != batch:
+        sys.exit("classify_batch disagrees with classify_comment")
+    print(f"{'speedup':<28} {t_scalar / t_batch:8.1f}x\n")
+
+    scalar, t_scalar = timed("is_mixed_content (loop)", n, lambda: [is_mixed_content(t) for t in as_list])
+    batch, t_batch = timed("mixed_batch", n, lambda: mixed_batch(texts, MIXED_PATTERNS))
+    if scalar != batch.tolist():
+        sys.exit("mixed_batch disagrees with is_mixed_content")
+    print(f"{'speedup':<28} {t_scalar / t_batch:8.1f}x\n")
+
+    # Matcher throughput should stay roughly flat as the keyword list grows
+    rng = random.Random(0)
+    for size in (len(TANGLISH_KEYWORDS), 1000, 5000, 20000):
+        extra = {"".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9))) for _ in range(size)}
+        matcher = KeywordMatcher(list(TANGLISH_KEYWORDS.keywords) + sorted(extra)[:size - len(TANGLISH_KEYWORDS)])
+        timed(f"match_batch ({len(matcher):,} terms)", n, lambda: matcher.match_batch(texts))
+
+
+if __name__ == "__main__":
+    main()
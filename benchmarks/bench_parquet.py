@@ -0,0 +1,123 @@
+"""Compare batch file layouts and codecs on the comment_data corpus
+
+    python benchmarks/bench_parquet.py [--limit N] [--codecs gzip snappy zstd:1 zstd:3 zstd:9 none]
+
+The corpus is replayed video by video through the two write paths: row dicts
+into the all-string schema (how batch files used to be built) and
+writer.comment_table() into BATCH_SCHEMA (dictionary-encoded video_id and
+type, native timestamps). For each, build time and memory are reported, then
+every codec is timed writing and reading the whole corpus.
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from compact import read_batch, OUTPUT_DIR, SCHEMA
+from writer import StreamingParquetWriter, BATCH_SCHEMA, comment_table
+
+CODECS = ["gzip", "snappy", "zstd:1", "zstd:3", "zstd:9", "none"]
+
+
+def load_videos(limit=None):
+    """The batch files as [(video_id, raw comments, types)], shaped like what the fetcher hands the writer"""
+    paths = sorted(glob.glob(os.path.join(OUTPUT_DIR, "*.parquet")))
+    if not paths:
+        return [], 0
+    table = pa.concat_tables(read_batch(path) for path in paths)
+    if limit is not None:
+        table = table.slice(0, limit)
+    published = pc.cast(pc.cast(table["published"], pa.timestamp("us")), pa.int64()).to_pylist()
+    videos = {}
+    for i, (vid, cid, text, type_name) in enumerate(zip(*(table[name].to_pylist() for name in
+                                                             ("video_id", "comment_id", "text", "type")))):
+        comments, types = videos.setdefault(vid, ([], []))
+        comments.append({"cid": cid, "text": text, "time_parsed": published[i] / 1e6 if published[i] else None})
+        types.append(type_name)
+    return [(vid, comments, types) for vid, (comments, types) in videos.items()], table.num_rows
+
+
+def build_rows(videos, scraped):
+    """The old accumulator: one dict per comment, converted with from_pylist"""
+    return [pa.Table.from_pylist([{
+        "video_id": vid,
+        "comment_id": comment["cid"],
+        "text": comment["text"].strip(),
+        "type": type_name,
+        "published": datetime.fromtimestamp(comment["time_parsed"]).isoformat() if comment["time_parsed"] else None,
+        "timestamp": scraped.isoformat(),
+    } for comment, type_name in zip(comments, types)], schema=SCHEMA) for vid, comments, types in videos]
+
+
+def build_columns(videos, scraped):
+    return [comment_table(vid, comments, types, scraped) for vid, comments, types in videos]
+
+
+def measure_build(label, fn, n):
+    tracemalloc.start()
+    arrow_before = pa.total_allocated_bytes()
+    start = time.perf_counter()
+    tables = fn()
+    elapsed = time.perf_counter() - start
+    python_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    arrow = pa.total_allocated_bytes() - arrow_before
+    print(f"{label:<10} {elapsed:8.2f}s {n / elapsed:>12,.0f} rows/s   tables {sum(t.nbytes for t in tables) / 2**20:8.1f} MiB   "
+          f"arrow {arrow / 2**20:8.1f} MiB   python peak {python_peak / 2**20:8.1f} MiB")
+    return tables
+
+
+def measure_codec(label, tables, codec, directory):
+    """Write the per-video tables through StreamingParquetWriter, as the scrapers do, then read the file back"""
+    compression, _, level = codec.partition(":")
+    path = os.path.join(directory, f"{label}-{codec.replace(':', '')}.parquet")
+    start = time.perf_counter()
+    with StreamingParquetWriter(path, compression=compression, compression_level=int(level) if level else None,
+                                schema=tables[0].schema) as writer:
+        for table in tables:
+            writer.write(table)
+    written = time.perf_counter() - start
+    start = time.perf_counter()
+    pq.read_table(path)
+    read = time.perf_counter() - start
+    size = os.path.getsize(path)
+    os.remove(path)
+    print(f"{label:<10} {codec:<8} {size / 2**20:8.1f} MiB  write {written:6.2f}s  read {read:6.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=None, help="only use the first N comments")
+    parser.add_argument("--codecs", nargs="+", default=CODECS, help="codec or codec:level")
+    args = parser.parse_args()
+
+    videos, n = load_videos(args.limit)
+    if not n:
+        sys.exit(f"No comments to benchmark in {OUTPUT_DIR}/*.parquet")
+    print(f"Corpus: {n:,} comments in {len(videos):,} videos from {OUTPUT_DIR}/\n")
+    scraped = datetime.now()
+    tables = {
+        "rows": measure_build("rows", lambda: build_rows(videos, scraped), n),
+        "columnar": measure_build("columnar", lambda: build_columns(videos, scraped), n),
+    }
+    if tables["columnar"][0].schema != BATCH_SCHEMA:
+        sys.exit("The columnar build does not match writer.BATCH_SCHEMA")
+    print()
+    with tempfile.TemporaryDirectory(prefix="bench_parquet_") as directory:
+        for codec in args.codecs:
+            for label, layout in tables.items():
+                measure_codec(label, layout, codec, directory)
+
+
+if __name__ == "__main__":
+    main()
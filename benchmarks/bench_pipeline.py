@@ -0,0 +1,283 @@
+"""End-to-end benchmarks on a synthetic comment source
+
+    python benchmarks/bench_pipeline.py [--videos N] [--comments N] [--latency MIN MAX] [--error-rate P] [--handshake S]
+
+Times each stage on its own (fetch, classify, write, combine with and without
+near-duplicate detection, archive and offline reclassify) and then the app.py,
+scra.py and rescrap.py flows end to end (scra.py also with --archive), each in
+a scratch directory, with YoutubeCommentDownloader replaced by the fake in
+benchmarks/synthetic.py. Last come cold starts of each cli.py command.
+Results are appended to benchmarks/results.jsonl with the git commit, and
+compared with the last run that used the same parameters.
+"""
+import argparse
+import contextlib
+import functools
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from unittest import mock
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+os.chdir(REPO)  # The scripts load their keyword files relative to the repo
+
+import app
+import archive
+import compact
+import rescrap
+import scra
+import state
+from classify import mixed_batch, mixed_type_batch, MIXED_PATTERNS_FILE, TANGLISH_KEYWORDS_FILE
+from fetcher import AdaptiveLimiter, fetch_batch
+from writer import StreamingParquetWriter, BATCH_SCHEMA, comment_table
+from synthetic import fake_downloader, patched_downloader, synthetic_corpus, video_ids, write_batches
+
+RESULTS_FILE = os.path.join(REPO, "benchmarks", "results.jsonl")
+CORPUS_SIZE = 50_000
+REGRESSION = 0.10  # Slowdown versus the previous run that gets flagged
+STARTUP_RUNS = 5   # Interpreter starts per cold-start benchmark
+
+
+@contextlib.contextmanager
+def scratch_dir():
+    """Run inside a temporary directory holding only the keyword files"""
+    path = tempfile.mkdtemp(prefix="bench_")
+    for name in (TANGLISH_KEYWORDS_FILE, MIXED_PATTERNS_FILE):
+        shutil.copy(os.path.join(REPO, name), path)
+    os.chdir(path)
+    try:
+        yield path
+    finally:
+        os.chdir(REPO)
+        shutil.rmtree(path, ignore_errors=True)
+
+
+@contextlib.contextmanager
+def quiet():
+    """Hide the scripts' progress bars and prints"""
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        yield
+
+
+def measure(results, name, fn, unit="comments"):
+    """Time fn(), which returns the number of comments (or other `unit`s) it handled"""
+    start = time.perf_counter()
+    items = fn()
+    seconds = time.perf_counter() - start
+    results[name] = {"seconds": round(seconds, 4), unit: items, "per_second": round(items / seconds, 1)}
+    print(f"{name:<20} {seconds:8.2f}s {items:>10,} {unit:<8} {items / seconds:>12,.0f}/s")
+
+
+def bench_fetch(args, ids):
+    fetched = []
+    with quiet():
+        fetch_batch(ids, lambda vid, comments, error, newest: fetched.append(len(comments)), args.comments,
+                    rate=args.rate, burst=args.rate)
+    return sum(fetched)
+
+
+def bench_classify(corpus, classify_chunk):
+    classify_chunk([(str(i), corpus[i:i + 200]) for i in range(0, len(corpus), 200)])
+    return len(corpus)
+
+
+def bench_classify_app(corpus):
+    """app.py's filter-then-label pass over every fetched comment"""
+    mixed = [text for text, keep in zip(corpus, mixed_batch(corpus, app.MIXED_PATTERNS)) if keep]
+    mixed_type_batch(mixed)
+    return len(corpus)
+
+
+def bench_write(corpus, ids):
+    with scratch_dir(), StreamingParquetWriter("batch.parquet", schema=BATCH_SCHEMA) as writer:
+        per_video = len(corpus) // len(ids)
+        for n, vid in enumerate(ids):
+            texts = corpus[n * per_video:(n + 1) * per_video]
+            comments = [{"cid": f"Ug{vid}{i:06d}", "text": text, "time_parsed": time.time()} for i, text in enumerate(texts)]
+            writer.write(comment_table(vid, comments, ["tanglish"] * len(texts), datetime.now()))
+    return writer.count
+
+
+def archive_comments(corpus, ids):
+    """The corpus as raw downloader dicts, split evenly over `ids`"""
+    per_video = len(corpus) // len(ids)
+    now = time.time()
+    return [(vid, [{"cid": f"Ug{vid}{i:06d}", "text": text, "time": f"{i} minutes ago", "time_parsed": now - 60 * i,
+                    "author": "@bench", "votes": "0", "replies": "0", "reply": False}
+                   for i, text in enumerate(corpus[n * per_video:(n + 1) * per_video])])
+            for n, vid in enumerate(ids)]
+
+
+def bench_archive(corpus, ids, path):
+    store = archive.RawArchive(path)
+    for vid, comments in archive_comments(corpus, ids):
+        store.add(vid, comments)
+    store.close()
+    return len(ids) * (len(corpus) // len(ids))
+
+
+def bench_reclassify(corpus, ids, path):
+    """Reads the archive the archive benchmark wrote (and writes it first when run on its own)"""
+    if not os.path.exists(os.path.join(path, "index.db")):
+        bench_archive(corpus, ids, path)
+    store = archive.RawArchive(path)
+    with scratch_dir(), quiet():
+        archive.reclassify(store, scra.classify_chunk)
+    comments = store.stats()["comments"]
+    store.close()
+    return comments
+
+
+def bench_combine(corpus, args, dedupe=None):
+    """Compacts the batch files into a new dataset; counts the comments read, duplicates included"""
+    with scratch_dir():
+        write_batches(compact.OUTPUT_DIR, corpus, args.batch_files, args.batch_rows, args.seed)
+        with quiet():
+            compact.compact(dedupe=dedupe)
+    return args.batch_files * args.batch_rows
+
+
+def bench_scraper(module, args, ids, flags=()):
+    """One full run of scra.py or rescrap.py over `ids`, including the final combine; counts fetched comments"""
+    with scratch_dir(), quiet(), mock.patch.multiple(
+            module, MAX_COMMENTS_PER_VIDEO=args.comments, REQUESTS_PER_SECOND=args.rate,
+            AdaptiveLimiter=functools.partial(AdaptiveLimiter, max_rate=args.rate, log_file=None)), \
+            mock.patch.multiple(state, RETRY_BASE_DELAY=0.01, RETRY_MAX_DELAY=0.1), \
+            mock.patch.object(sys, "argv", [module.__name__ + ".py", *flags]):
+        with open(module.VIDEO_IDS_FILE, "w") as f:
+            f.write("".join(f"{vid}\n" for vid in ids))
+        module.main()
+        store = state.StateStore(module.STATE_FILE)
+        fetched = store.db.execute("SELECT SUM(comments) FROM videos").fetchone()[0] or 0
+        store.close()
+        return fetched
+
+
+def bench_app(args, ids):
+    """app.py keeps only mixed comments, so this counts the comments it fetched"""
+    scrape = app.scrape_video_comments
+    fetched = []
+
+    def counted(video_id):
+        result = scrape(video_id)
+        fetched.append(len(result[1]))
+        return result
+
+    with scratch_dir(), quiet(), mock.patch.multiple(app, VIDEO_IDS=ids, MAX_COMMENTS_PER_VIDEO=args.comments,
+                                                     scrape_video_comments=counted):
+        app.main()
+    return sum(fetched)
+
+
+def bench_startup(command):
+    """Cold starts of `python cli.py COMMAND`: a fresh interpreter each time, so every import is paid again"""
+    with scratch_dir():
+        for _ in range(STARTUP_RUNS):
+            subprocess.run([sys.executable, os.path.join(REPO, "cli.py"), *command], check=True,
+                           stdout=subprocess.DEVNULL)
+    return STARTUP_RUNS
+
+
+def compare(record):
+    """Print the change since the last run with the same parameters"""
+    previous = None
+    if os.path.exists(RESULTS_FILE):
+        with open(RESULTS_FILE) as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry["params"] == record["params"]:
+                    previous = entry
+    if previous is None:
+        return
+    print(f"\nCompared with {previous['commit'] or 'unknown commit'} ({previous['time']}):")
+    for name, result in record["results"].items():
+        before = previous["results"].get(name)
+        if before:
+            change = result["per_second"] / before["per_second"] - 1
+            flag = " ⚠️" if change < -REGRESSION else ""
+            print(f"{name:<20} {change:+8.1%}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--videos", type=int, default=200)
+    parser.add_argument("--comments", type=int, default=200, help="comments per video")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--latency", type=float, nargs=2, default=(0.0, 0.005), metavar=("MIN", "MAX"),
+                        help="seconds per page")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of pages that fail")
+    parser.add_argument("--handshake", type=float, default=0.0,
+                        help="extra seconds for the first video on each new downloader session")
+    parser.add_argument("--rate", type=float, default=500.0, help="page requests per second allowed")
+    parser.add_argument("--batch-files", type=int, default=20, help="batch files for the combine benchmark")
+    parser.add_argument("--batch-rows", type=int, default=20_000, help="rows per batch file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stages", nargs="+", help="only run these benchmarks")
+    parser.add_argument("--no-save", action="store_true", help="do not append to results.jsonl")
+    args = parser.parse_args()
+
+    corpus = synthetic_corpus(CORPUS_SIZE, args.seed)
+    ids = video_ids(args.videos, args.seed)
+    archive_dir = tempfile.mkdtemp(prefix="bench_archive_")
+    downloader = fake_downloader(corpus, args.comments, args.page_size, tuple(args.latency), args.error_rate, args.seed,
+                                 args.handshake)
+    benchmarks = {
+        "fetch": lambda: bench_fetch(args, ids),
+        "classify rescrap": lambda: bench_classify(corpus, rescrap.classify_chunk),
+        "classify scra": lambda: bench_classify(corpus, scra.classify_chunk),
+        "classify app": lambda: bench_classify_app(corpus),
+        "write": lambda: bench_write(corpus, ids),
+        "combine": lambda: bench_combine(corpus, args),
+        "combine dedupe near": lambda: bench_combine(corpus, args, "near"),
+        "archive": lambda: bench_archive(corpus, ids, archive_dir),
+        "reclassify": lambda: bench_reclassify(corpus, ids, archive_dir),
+        "e2e app.py": lambda: bench_app(args, ids),
+        "e2e scra.py": lambda: bench_scraper(scra, args, ids),
+        "e2e scra.py archive": lambda: bench_scraper(scra, args, ids, ["--archive"]),
+        "e2e rescrap.py": lambda: bench_scraper(rescrap, args, ids),
+    }
+    # --help imports the command's script and stops, so these time the imports alone (stats runs in full)
+    startups = {f"startup {command}": [command] if command == "stats" else [command, "--help"]
+                for command in ("stats", "ids", "scrape", "combine", "export")}
+
+    params = {key: value for key, value in vars(args).items() if key not in ("stages", "no_save")}
+    params["latency"] = list(params["latency"])
+    if not args.handshake:
+        del params["handshake"]  # Still comparable with runs from before the option existed
+    print(f"Synthetic source: {args.videos} videos x {args.comments} comments, pages of {args.page_size}, "
+          f"latency {args.latency[0]}-{args.latency[1]}s, error rate {args.error_rate:.0%}, "
+          f"session handshake {args.handshake}s\n")
+    results = {}
+    try:
+        with patched_downloader(downloader):
+            for name, fn in benchmarks.items():
+                if not args.stages or any(name.startswith(stage) for stage in args.stages):
+                    measure(results, name, fn)
+            for name, command in startups.items():
+                if not args.stages or any(name.startswith(stage) for stage in args.stages):
+                    measure(results, name, functools.partial(bench_startup, command), unit="starts")
+    finally:
+        shutil.rmtree(archive_dir, ignore_errors=True)
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=REPO).stdout.strip() or None
+    except OSError:
+        commit = None
+    record = {"time": datetime.now().isoformat(), "commit": commit, "params": params, "results": results}
+    compare(record)
+    if not args.no_save:
+        with open(RESULTS_FILE, "a") as f:
+            f.write(json.dumps(record) + "\n")
+        print(f"\n💾 Saved to {os.path.relpath(RESULTS_FILE, REPO)}")
+
+
+if __name__ == "__main__":
+    main()
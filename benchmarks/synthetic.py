@@ -0,0 +1,130 @@
+"""Deterministic stand-ins for YouTube used by the benchmarks
+
+synthetic_corpus() builds comments shaped like comment_data/ (mostly short
+code-mixed and Tanglish lines, some pure Tamil, English and emoji-only ones),
+and fake_downloader() returns a YoutubeCommentDownloader replacement that
+serves them with configurable latency, page size and error rate.
+"""
+import contextlib
+import os
+import random
+import time
+from datetime import datetime
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+TAMIL_WORDS = ["வணக்கம்", "நன்றி", "அருமை", "சூப்பர்", "தலைவா", "நல்ல", "பதிவு", "விளக்கம்", "மிகவும்", "அண்ணா",
+               "வாழ்த்துக்கள்", "இந்த", "வீடியோ", "எப்படி", "இருக்கு", "உங்கள்", "தெளிவான", "தமிழ்", "செம்ம", "பார்த்தேன்"]
+TANGLISH_WORDS = ["anna", "super", "bro", "nalla", "romba", "semma", "thala", "epdi", "irukku", "unga", "pannunga",
+                  "enna", "video", "vera", "level", "sir", "thanks", "ippo", "vanakkam", "machan", "sema", "podunga"]
+ENGLISH_WORDS = ["great", "video", "please", "explain", "good", "nice", "thank", "you", "this", "is", "the", "best",
+                 "review", "price", "quality", "awesome", "content", "waiting", "for", "next", "part", "love", "it"]
+EMOJI = ["👍", "🔥", "❤️", "😂", "🙏", "💕", "🏆", "🇮🇳"]
+
+# Share of each comment shape, roughly as in comment_data/
+SHAPES = [("code_mixed", 0.17), ("tanglish", 0.40), ("english", 0.30), ("pure_tamil", 0.11), ("emoji", 0.02)]
+
+
+def _comment(rng, shape):
+    words = max(1, int(rng.lognormvariate(1.8, 0.8)))
+    if shape == "pure_tamil":
+        text = " ".join(rng.choice(TAMIL_WORDS) for _ in range(words))
+    elif shape == "tanglish":
+        text = " ".join(rng.choice(TANGLISH_WORDS + ENGLISH_WORDS[:6]) for _ in range(words))
+    elif shape == "english":
+        text = " ".join(rng.choice(ENGLISH_WORDS) for _ in range(words))
+    elif shape == "code_mixed":
+        text = " ".join(rng.choice(TAMIL_WORDS if rng.random() < 0.5 else ENGLISH_WORDS) for _ in range(words))
+    else:
+        return "".join(rng.choice(EMOJI) for _ in range(rng.randint(1, 5)))
+    if rng.random() < 0.3:
+        text = text.capitalize() + rng.choice([".", "!", "!!", " " + rng.choice(EMOJI)])
+    return text
+
+
+def synthetic_corpus(size, seed=0):
+    """`size` synthetic comment texts, the same for the same seed"""
+    rng = random.Random(seed)
+    shapes, weights = zip(*SHAPES)
+    return [_comment(rng, shape) for shape in rng.choices(shapes, weights, k=size)]
+
+
+def fake_downloader(corpus, comments_per_video=200, page_size=20, latency=(0.0, 0.0), error_rate=0.0, seed=0,
+                    handshake=0.0):
+    """A YoutubeCommentDownloader class serving `corpus`.
+
+    Each video gets `comments_per_video` comments, newest first, with a sleep
+    drawn from `latency` per page of `page_size`. A page fails with
+    `error_rate` probability; results depend only on the seed, video ID and
+    how often that video was requested. The first video on each instance also
+    sleeps `handshake` seconds, standing in for connection setup and consent."""
+
+    class FakeDownloader:
+        requests = {}
+
+        def __init__(self):
+            self.warm = False
+
+        def get_comments(self, youtube_id, sort_by=1, language=None, sleep=.1):
+            attempt = FakeDownloader.requests[youtube_id] = FakeDownloader.requests.get(youtube_id, 0) + 1
+            rng = random.Random(f"{seed}:{youtube_id}:{attempt}")
+            texts = random.Random(f"{seed}:{youtube_id}")
+            if not self.warm:
+                time.sleep(handshake)
+                self.warm = True
+            now = time.time()
+            for start in range(0, comments_per_video, page_size):
+                time.sleep(rng.uniform(*latency))
+                if rng.random() < error_rate:
+                    raise RuntimeError("synthetic server error")
+                for i in range(start, min(start + page_size, comments_per_video)):
+                    yield {"cid": f"Ug{youtube_id}{i:06d}", "text": corpus[texts.randrange(len(corpus))],
+                           "time": f"{i} minutes ago", "time_parsed": now - 60 * i, "author": "@bench",
+                           "votes": "0", "replies": "0", "reply": False}
+
+    return FakeDownloader
+
+
+@contextlib.contextmanager
+def patched_downloader(downloader, *modules):
+    """Swap YoutubeCommentDownloader for `downloader`, in the package and in modules that imported it"""
+    import youtube_comment_downloader
+    targets = [youtube_comment_downloader] + list(modules)
+    saved = [module.YoutubeCommentDownloader for module in targets]
+    for module in targets:
+        module.YoutubeCommentDownloader = downloader
+    try:
+        yield
+    finally:
+        for module, original in zip(targets, saved):
+            module.YoutubeCommentDownloader = original
+
+
+def video_ids(count, seed=0):
+    """`count` distinct 11-character video IDs"""
+    rng = random.Random(seed)
+    alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"
+    ids = set()
+    while len(ids) < count:
+        ids.add("".join(rng.choice(alphabet) for _ in range(11)))
+    return sorted(ids)
+
+
+def write_batches(directory, corpus, files, rows_per_file, seed=0):
+    """Batch files shaped like comment_data/ (video_id, text, type, timestamp) for the combine benchmark"""
+    from rescrap import classify_chunk
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    videos_per_file = max(1, rows_per_file // 200)
+    ids = video_ids(videos_per_file * files, seed)
+    for n in range(files):
+        batch_ids = ids[n * videos_per_file:(n + 1) * videos_per_file]
+        texts = [rng.choice(corpus) for _ in range(rows_per_file)]
+        [(_, types)] = classify_chunk([(None, texts)])
+        table = pa.table({
+            "video_id": [batch_ids[i * videos_per_file // rows_per_file] for i in range(rows_per_file)],
+            "text": texts,
+            "type": types,
+            "timestamp": [datetime.now().isoformat()] * rows_per_file,
+        })
+        pq.write_table(table, os.path.join(directory, f"batch_{n + 1}_{datetime.now().strftime('%Y%m%d')}.parquet"))
@@ -0,0 +1,290 @@
+"""List the video IDs of YouTube channels over plain HTTP (no browser)
+
+    python channels.py https://www.youtube.com/@Behindwoodstv/videos [more channel URLs] [--full]
+
+Each channel's videos tab is read page by page through YouTube's continuation
+requests, several channels at once. The tab lists newest videos first, so a
+channel stops as soon as a page contains an ID that is already indexed; --full
+reads every page anyway. New IDs are appended to all_video_ids.txt for the
+scrapers and recorded in video_index.db.
+
+Pages can be saved with --record DIR and served back locally with FixtureServer
+(pass its URL as --base-url) to run the enumerator without touching YouTube.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, urlparse
+from fetcher import TokenBucket
+
+# Configuration
+YOUTUBE_URL = "https://www.youtube.com"
+VIDEO_IDS_FILE = "all_video_ids.txt"
+INDEX_FILE = "video_index.db"
+REQUESTS_PER_SECOND = 2.0  # Page requests per second across all channels
+REQUEST_BURST = 5
+MAX_CHANNELS = 8           # Channels enumerated at the same time
+MAX_RETRIES = 3            # Per page, on 429 / 5xx responses
+VIDEO_ID_RE = re.compile(r"^[A-Za-z0-9_-]{11}$")
+TABS = ("videos", "shorts", "streams")
+
+
+def _find(data, key):
+    """Values of `key` anywhere in nested JSON, in document order"""
+    if isinstance(data, dict):
+        for k, value in data.items():
+            if k == key:
+                yield value
+            else:
+                yield from _find(value, key)
+    elif isinstance(data, list):
+        for item in data:
+            yield from _find(item, key)
+
+
+def parse_page(data):
+    """(video IDs, continuation token or None) from a videos tab page or continuation response"""
+    video_ids = []
+    for renderer in ("richItemRenderer", "gridVideoRenderer"):
+        for item in _find(data, renderer):
+            vid = next(_find(item, "videoId"), None)
+            if vid and VIDEO_ID_RE.match(vid) and vid not in video_ids:
+                video_ids.append(vid)
+    tokens = [next(_find(item, "token"), None) for item in _find(data, "continuationItemRenderer")]
+    tokens = [token for token in tokens if token]
+    return video_ids, tokens[-1] if tokens else None
+
+
+def tab_path(channel_url):
+    """URL path of a channel's videos tab, from a channel URL or a bare @handle / UC... ID"""
+    path = urlparse(channel_url).path if "/" in channel_url else "/" + channel_url
+    if not path.startswith(("/@", "/channel/", "/c/", "/user/")):
+        path = "/channel" + path
+    if path.rstrip("/").rsplit("/", 1)[-1] not in TABS:
+        path = path.rstrip("/") + "/videos"
+    return path
+
+
+class VideoIndex:
+    """Video IDs already listed, in SQLite so checking a page never loads the whole list.
+
+    Seeded from all_video_ids.txt the first time; new IDs are added to both."""
+
+    def __init__(self, path=INDEX_FILE, ids_file=VIDEO_IDS_FILE):
+        self.ids_file = ids_file
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS ids (video_id TEXT PRIMARY KEY, channel TEXT, added TEXT)")
+        if ids_file and os.path.exists(ids_file) and not self.db.execute("SELECT 1 FROM ids LIMIT 1").fetchone():
+            with open(ids_file) as f, self.db:
+                self.db.executemany("INSERT OR IGNORE INTO ids (video_id) VALUES (?)",
+                                    ((line.strip(),) for line in f if len(line.strip()) == 11))
+
+    def known(self, video_ids):
+        """The subset of `video_ids` already in the index"""
+        video_ids = list(video_ids)
+        if not video_ids:
+            return set()
+        rows = self.db.execute(f"SELECT video_id FROM ids WHERE video_id IN ({','.join('?' * len(video_ids))})",
+                               video_ids)
+        return {row[0] for row in rows}
+
+    def add(self, channel, video_ids):
+        """Index new IDs and append them to the IDs file; returns the ones that were new"""
+        known = self.known(video_ids)
+        new_ids = [vid for vid in video_ids if vid not in known]
+        now = datetime.now().isoformat()
+        with self.db:
+            self.db.executemany("INSERT OR IGNORE INTO ids (video_id, channel, added) VALUES (?, ?, ?)",
+                                ((vid, channel, now) for vid in new_ids))
+        if new_ids and self.ids_file:
+            with open(self.ids_file, "a") as f:
+                f.write("".join(f"{vid}\n" for vid in new_ids))
+        return new_ids
+
+    def channels(self):
+        """{video_id: channel tab path} for IDs that were listed from a channel"""
+        return dict(self.db.execute("SELECT video_id, channel FROM ids WHERE channel IS NOT NULL"))
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM ids").fetchone()[0]
+
+    def close(self):
+        self.db.close()
+
+
+class ChannelEnumerator:
+    """Reads channel pages over HTTP; blocking requests run in a thread pool, paced by one token bucket"""
+
+    def __init__(self, index, base_url=YOUTUBE_URL, rate=REQUESTS_PER_SECOND, burst=REQUEST_BURST,
+                 max_channels=MAX_CHANNELS, record_dir=None):
+        self.index = index
+        self.base_url = base_url.rstrip("/")
+        self.limiter = TokenBucket(rate, burst)
+        self.max_channels = max_channels
+        self.record_dir = record_dir
+        self.executor = ThreadPoolExecutor(max_workers=max_channels)
+        # Imported here: scra.py only needs VideoIndex, and the downloader pulls in dateparser (~0.4s)
+        import requests
+        from youtube_comment_downloader.downloader import USER_AGENT
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        self.session.cookies.set("CONSENT", "YES+cb", domain=".youtube.com")
+
+    async def _request(self, method, url, **kwargs):
+        loop = asyncio.get_running_loop()
+        for attempt in range(MAX_RETRIES):
+            await self.limiter.acquire()
+            response = await loop.run_in_executor(self.executor, lambda: self.session.request(method, url, **kwargs))
+            if response.status_code == 200:
+                return response
+            if response.status_code != 429 and response.status_code < 500:
+                break
+            await asyncio.sleep(2 ** attempt)
+        raise RuntimeError(f"HTTP {response.status_code} for {url}")
+
+    def _record(self, name, text):
+        if self.record_dir:
+            os.makedirs(self.record_dir, exist_ok=True)
+            with open(os.path.join(self.record_dir, name), "w", encoding="utf-8") as f:
+                f.write(text)
+
+    async def channel(self, channel_url, full=False):
+        """New video IDs of one channel, newest first, stopping at the first indexed page"""
+        path = tab_path(channel_url)
+        html = (await self._request("GET", self.base_url + path)).text
+        self._record(fixture_name(path), html)
+        from youtube_comment_downloader.downloader import YT_CFG_RE, YT_INITIAL_DATA_RE
+        ytcfg = re.search(YT_CFG_RE, html)
+        data = re.search(YT_INITIAL_DATA_RE, html)
+        if not ytcfg or not data:
+            raise RuntimeError(f"no page data for {path}")
+        ytcfg, data = json.loads(ytcfg.group(1)), json.loads(data.group(1))
+
+        new_ids, pages = [], 1
+        while True:
+            video_ids, token = parse_page(data)
+            known = self.index.known(video_ids)
+            new_ids += [vid for vid in video_ids if vid not in known and vid not in new_ids]
+            if not token or (known and not full):
+                break
+            response = await self._request(
+                "POST", f"{self.base_url}/youtubei/v1/browse", params={"key": ytcfg.get("INNERTUBE_API_KEY")},
+                json={"context": ytcfg.get("INNERTUBE_CONTEXT"), "continuation": token})
+            self._record(fixture_name(token=token), response.text)
+            data = response.json()
+            pages += 1
+        return new_ids, pages
+
+    async def channels(self, channel_urls, full=False):
+        """Enumerate channels concurrently; each channel's IDs are indexed once it has been read to its stop point"""
+        slots = asyncio.Semaphore(self.max_channels)
+        added = {}
+
+        async def run(url):
+            async with slots:
+                try:
+                    new_ids, pages = await self.channel(url, full)
+                except Exception as e:
+                    # Nothing is indexed, so the next run reads this channel from the top again
+                    print(f"⚠️ Failed {url}: {str(e)}")
+                    return
+            added[url] = self.index.add(tab_path(url), new_ids)
+            print(f"📺 {tab_path(url)}: {len(added[url])} new videos ({pages} pages)")
+
+        await asyncio.gather(*(run(url) for url in channel_urls))
+        return added
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.session.close()
+
+
+def fixture_name(path=None, token=None):
+    """File name a recorded page is saved under: the tab path, or a hash of the continuation token"""
+    if token is not None:
+        return hashlib.sha1(token.encode()).hexdigest() + ".json"
+    return quote(path, safe="") + ".html"
+
+
+class FixtureServer:
+    """Serves pages saved with --record on localhost, in place of www.youtube.com
+
+        with FixtureServer("fixtures") as base_url:
+            ChannelEnumerator(index, base_url=base_url) ...
+
+    tests/fixtures/channel/ holds a three-page channel served this way in tests/test_channels.py."""
+
+    def __init__(self, directory, port=0):
+        directory = os.path.abspath(directory)
+
+        class Handler(BaseHTTPRequestHandler):
+            def _send(self, name, content_type):
+                path = os.path.join(directory, name)
+                if not os.path.exists(path):
+                    self.send_error(404)
+                    return
+                with open(path, "rb") as f:
+                    body = f.read()
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._send(fixture_name(urlparse(self.path).path), "text/html; charset=utf-8")
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                self._send(fixture_name(token=body.get("continuation", "")), "application/json")
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.url
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def fetch_channel_ids(channel_urls, full=False, base_url=YOUTUBE_URL, record_dir=None,
+                      index_file=INDEX_FILE, ids_file=VIDEO_IDS_FILE):
+    """Blocking entry point: index new video IDs from the channels, return {channel_url: new IDs}"""
+    index = VideoIndex(index_file, ids_file)
+    enumerator = ChannelEnumerator(index, base_url=base_url, record_dir=record_dir)
+    try:
+        return asyncio.run(enumerator.channels(channel_urls, full))
+    finally:
+        enumerator.close()
+        index.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add new video IDs from YouTube channels to " + VIDEO_IDS_FILE)
+    parser.add_argument("channels", nargs="+", help="channel URLs, @handles or UC... channel IDs")
+    parser.add_argument("--full", action="store_true", help="read every page instead of stopping at indexed videos")
+    parser.add_argument("--record", metavar="DIR", help="save every page fetched, for use with FixtureServer")
+    parser.add_argument("--base-url", default=YOUTUBE_URL, help="fetch from here instead of YouTube")
+    args = parser.parse_args()
+
+    added = fetch_channel_ids(args.channels, args.full, args.base_url, args.record)
+    print(f"✅ {sum(map(len, added.values()))} new video IDs added to {VIDEO_IDS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
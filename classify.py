@@ -0,0 +1,145 @@
+import re
+import pyarrow as pa
+import pyarrow.compute as pc
+
+TANGLISH_KEYWORDS_FILE = "tanglish_keywords.txt"
+MIXED_PATTERNS_FILE = "mixed_patterns.txt"
+RULE_SEPARATOR = "..."
+# RE2 falls back from its DFA to a much slower engine once a pattern grows past a few
+# thousand keywords, so batch matching splits the trie into chunks of this many
+MAX_BATCH_KEYWORDS = 2000
+
+# Vectorised equivalents of the per-character ord() scans, in RE2 syntax.
+# WHITESPACE is exactly the set of code points where str.isspace() is true.
+TAMIL = r"\x{0B80}-\x{0BFF}"
+WHITESPACE = (r"\x{09}-\x{0D}\x{1C}-\x{20}\x{85}\x{A0}\x{1680}\x{2000}-\x{200A}"
+              r"\x{2028}\x{2029}\x{202F}\x{205F}\x{3000}")
+EMPTY_RE = f"^[{WHITESPACE}]*$"
+PURE_TAMIL_RE = f"^[{TAMIL}{WHITESPACE},.!?;:]*$"
+TAMIL_RE = f"[{TAMIL}]"
+ENGLISH_RE = "[A-Za-z]"
+# Non-ASCII letters that RE2's case folding maps onto ASCII (İ ı ſ K); rows holding
+# them are matched with Python's ASCII-only IGNORECASE instead
+FOLDED_ASCII_RE = r"[\x{130}\x{131}\x{17F}\x{212A}]"
+
+
+def _trie_pattern(words):
+    """Regex alternation shaped like a trie, so matching cost follows word length, not word count"""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        group = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        return f"(?:{group})?" if "" in node else group
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """Keywords and ordered co-occurrence rules compiled into one case-insensitive regex.
+
+    The pattern only uses syntax shared by Python's re (in ASCII mode) and RE2, so
+    search() and match_batch() give the same answers."""
+
+    def __init__(self, keywords=(), rules=()):
+        self.keywords = sorted({kw.lower() for kw in keywords})
+        self.rules = [tuple(term.lower() for term in rule) for rule in rules]
+        for term in self.keywords + [term for rule in self.rules for term in rule]:
+            if not re.fullmatch(r"\w(.*\w)?", term, re.ASCII):
+                raise ValueError(f"Keyword must start and end with a letter or digit: {term!r}")
+
+        chunks = [self.keywords[i:i + MAX_BATCH_KEYWORDS] for i in range(0, len(self.keywords), MAX_BATCH_KEYWORDS)]
+        alternatives = [r"\b" + _trie_pattern(chunk) + r"\b" for chunk in chunks]
+        rules = [".*".join(r"\b" + re.escape(term) + r"\b" for term in rule) for rule in self.rules]
+        # An empty matcher matches nothing
+        self.batch_patterns = alternatives[:-1] + ["|".join(alternatives[-1:] + rules) or r"[^\s\S]"]
+        self.pattern = "|".join(alternatives + rules) or r"[^\s\S]"
+        self.regex = re.compile(self.pattern, re.IGNORECASE | re.ASCII)
+
+    def __len__(self):
+        return len(self.keywords) + len(self.rules)
+
+    def search(self, text):
+        """True if any keyword or rule matches `text`"""
+        return self.regex.search(text) is not None
+
+    def match_batch(self, texts):
+        """Boolean pyarrow mask of rows where search() would be true"""
+        arr = _as_array(texts)
+        matched = pc.match_substring_regex(arr, self.batch_patterns[0], ignore_case=True)
+        for pattern in self.batch_patterns[1:]:
+            matched = pc.or_(matched, pc.match_substring_regex(arr, pattern, ignore_case=True))
+        folded = pc.match_substring_regex(arr, FOLDED_ASCII_RE)
+        return pc.if_else(folded, _exact(arr, folded, self.search), matched)
+
+
+def load_keywords(path):
+    """Build a KeywordMatcher from a keyword file (one term, phrase or "a ... b" rule per line)"""
+    keywords, rules = [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            if RULE_SEPARATOR in line:
+                rules.append([" ".join(term.split()) for term in line.split(RULE_SEPARATOR)])
+            else:
+                keywords.append(" ".join(line.split()))
+    return KeywordMatcher(keywords, rules)
+
+
+def _as_array(texts):
+    if isinstance(texts, pa.ChunkedArray):
+        return texts.combine_chunks()
+    if isinstance(texts, pa.Array):
+        return texts
+    return pa.array(list(texts), type=pa.string())
+
+
+def _exact(arr, mask, check):
+    """Run the Python reference `check` only on rows selected by `mask`"""
+    mask = mask.to_numpy(zero_copy_only=False)
+    result = mask.copy()
+    texts = arr.filter(pa.array(mask)).to_pylist()
+    result[mask] = [check(text) for text in texts]
+    return pa.array(result)
+
+
+def has_tamil_batch(texts):
+    """Boolean mask of comments containing any Tamil character"""
+    return pc.match_substring_regex(_as_array(texts), TAMIL_RE).to_numpy(zero_copy_only=False)
+
+
+def classify_batch(texts, keywords):
+    """Classify a whole column into empty/pure_tamil/tanglish/code_mixed (same labels as rescrap.classify_comment)"""
+    arr = _as_array(texts)
+    empty = pc.match_substring_regex(arr, EMPTY_RE)
+    pure = pc.match_substring_regex(arr, PURE_TAMIL_RE)
+    tamil = pc.match_substring_regex(arr, TAMIL_RE)
+    tanglish = pc.and_(pc.invert(tamil), keywords.match_batch(arr))
+
+    labels = pc.if_else(tanglish, "tanglish", "code_mixed")
+    labels = pc.if_else(pure, "pure_tamil", labels)
+    labels = pc.if_else(empty, "empty", labels)
+    return labels.to_pylist()
+
+
+def mixed_batch(texts, patterns):
+    """Boolean mask for a whole column, matching the per-comment is_mixed_content in benchmarks/bench_classify.py"""
+    arr = _as_array(texts)
+    tamil = pc.match_substring_regex(arr, TAMIL_RE)
+    english = pc.match_substring_regex(arr, ENGLISH_RE)
+    return pc.or_(pc.and_(tamil, english), patterns.match_batch(arr)).to_numpy(zero_copy_only=False)
+
+
+def mixed_type_batch(texts):
+    """app.py's type column: tamil_english if the comment has Tamil script, else tanglish"""
+    tamil = pc.match_substring_regex(_as_array(texts), TAMIL_RE)
+    return pc.if_else(tamil, "tamil_english", "tanglish").to_pylist()
@@ -0,0 +1,107 @@
+"""One entry point for the scraping scripts
+
+    python cli.py ids https://www.youtube.com/@Behindwoodstv/videos   # channels.py
+    python cli.py scrape [--scraper scra|rescrap|app] [--since-last-run] [--archive] ...
+    python cli.py combine [--by-date] [--dedupe [id|exact|near]]    # compact.py
+    python cli.py export code_mixed_comments.csv --type code_mixed  # export.py
+    python cli.py stats
+
+Each command runs the script it stands for with the options that follow it
+(`python cli.py COMMAND --help` lists them); the scripts still work on their
+own. A script is only imported once its command is picked, so pandas, pyarrow
+and the downloader load only for the commands that use them. stats reads the
+state stores and the dataset manifest directly and starts in a fraction of a
+second.
+"""
+import argparse
+import importlib
+import json
+import os
+import sys
+
+# Configuration (the scripts' own file names, repeated so stats imports none of them)
+VIDEO_IDS_FILE = "all_video_ids.txt"
+STATE_FILES = ("processed.db", "progress.db")  # scra.py's and rescrap.py's
+OUTPUT_DIR = "comment_data"
+WORKERS_DIR = os.path.join(OUTPUT_DIR, "workers")  # work.py's STATE_DIR
+SHARD_DIR = os.path.join("work", "shards")  # work.py's WORK_DIR/SHARDS, the default work directory's shards
+MANIFEST_FILE = os.path.join("comment_dataset", "_manifest.json")
+SCRAPERS = ("scra", "rescrap", "app")
+COMMANDS = {
+    "ids": "channels",
+    "scrape": None,  # --scraper picks the script
+    "combine": "compact",
+    "export": "export",
+    "stats": None,
+}
+
+
+def state_files():
+    """State stores in the working directory and those of scra.py --work-dir workers on this host"""
+    paths = [path for path in STATE_FILES if os.path.exists(path)]
+    if os.path.isdir(WORKERS_DIR):
+        paths += [os.path.join(WORKERS_DIR, worker, name) for worker in sorted(os.listdir(WORKERS_DIR))
+                  for name in STATE_FILES if os.path.exists(os.path.join(WORKERS_DIR, worker, name))]
+    return paths
+
+
+def stats():
+    """Print video IDs, per-store progress and dataset totals"""
+    from state import StateStore
+
+    if os.path.exists(VIDEO_IDS_FILE):
+        with open(VIDEO_IDS_FILE) as f:
+            print(f"📋 {sum(1 for line in f if len(line.strip()) == 11):,} video IDs in {VIDEO_IDS_FILE}")
+    for path in state_files():
+        state = StateStore(path)
+        counts = state.counts()
+        state.close()
+        by_status = sorted(counts.items(), key=lambda item: -item[1])
+        print(f"🎬 {path}: {sum(counts.values()):,} videos | "
+              + ", ".join(f"{count:,} {status}" for status, count in by_status))
+
+    manifest = {"runs": 0, "files": {}, "counts": {}}
+    if os.path.exists(MANIFEST_FILE):
+        with open(MANIFEST_FILE) as f:
+            manifest = json.load(f)
+    # Named as compact.py names them in the manifest: relative in OUTPUT_DIR, absolute in the shards
+    files = [os.path.relpath(os.path.join(root, name), OUTPUT_DIR).replace(os.sep, "/")
+             for root, _, names in os.walk(OUTPUT_DIR) for name in names if name.endswith((".parquet", ".csv"))]
+    files += [os.path.abspath(os.path.join(root, name)).replace(os.sep, "/")
+              for root, _, names in os.walk(SHARD_DIR) for name in names if name.endswith((".parquet", ".csv"))]
+    waiting = sum(1 for file in files if file not in manifest["files"])
+    print(f"📦 {len(files):,} batch files in {OUTPUT_DIR}/ and {SHARD_DIR}/, {waiting:,} not combined yet")
+    counts = manifest["counts"]
+    print(f"✅ {sum(counts.values()):,} comments in the dataset after {manifest['runs']} runs")
+    for type_name, count in sorted(counts.items(), key=lambda item: -item[1]):
+        print(f"{type_name:<12} {count}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=COMMANDS)
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="the command's own options")
+    args = parser.parse_args(argv)
+
+    if args.command == "stats":
+        if args.args:
+            parser.error("stats takes no options")
+        stats()
+        return
+    rest = args.args
+    module = COMMANDS[args.command]
+    if args.command == "scrape":
+        # add_help=False leaves --help to the scraper
+        scrape = argparse.ArgumentParser(add_help=False)
+        scrape.add_argument("--scraper", choices=SCRAPERS, default="scra")
+        picked, rest = scrape.parse_known_args(rest)
+        module = picked.scraper
+        if module == "app" and rest:
+            parser.error("app.py takes no options (its video IDs are in app.VIDEO_IDS)")
+    # The scripts parse sys.argv themselves; this keeps "cli.py COMMAND" in their usage lines
+    sys.argv = [f"{os.path.basename(sys.argv[0])} {args.command}", *rest]
+    importlib.import_module(module).main()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+"""Persistent inverted index over the collected comments
+
+    python comment_index.py build
+    python comment_index.py search 'semma "vera level"' [--video-id ID ...] [--type tanglish ...] [--limit N]
+
+`build` indexes batch files in comment_data/ and in scra.py workers' shards
+under work/shards/ (and oldcomments.csv) that are not indexed yet; each run
+adds a segment under comment_index/. Segments of about the same size are
+merged once MERGE_FACTOR of them pile up (tiered merging), so an append
+never rewrites the large segments built before it and every comment is
+rewritten only a few times over the index's life.
+Every segment is a set of flat files opened with mmap, so a query only
+touches the terms it looks up, their postings and the matching rows:
+
+    terms.bin / term_offsets.npy          sorted UTF-8 terms
+    postings.npy / posting_offsets.npy    sorted row numbers per term
+    texts.bin / text_offsets.npy          comment text per row
+    video.npy, type.npy                   per-row codes into videos.json, types.json
+
+Text is lowercased and split on anything that is not a letter, combining mark
+(Tamil vowel signs), digit or underscore, so Tamil-script words are tokens too.
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import time
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from compact import batch_files, read_batch, OUTPUT_DIR
+from work import WORK_DIR, SHARDS
+
+# Configuration
+INDEX_DIR = "comment_index"
+MANIFEST_FILE = os.path.join(INDEX_DIR, "_manifest.json")
+EXTRA_SOURCES = ["oldcomments.csv"]  # Indexed along with the batch files in OUTPUT_DIR
+SHARD_DIR = os.path.join(WORK_DIR, SHARDS)  # Worker shards, when the work directory is the default one
+SEGMENT_ROWS = 500_000               # Rows buffered before a segment is written
+MERGE_FACTOR = 4                     # Segments of one size tier merged together once there are this many
+TIER_ROWS = SEGMENT_ROWS             # Tier n holds segments of up to TIER_ROWS * MERGE_FACTOR**n rows
+TOKEN_SPLIT = r"[^\p{L}\p{M}\p{N}_]+"
+QUERY_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def tokenize(texts):
+    """Token lists for an array of texts, the same way for documents and queries"""
+    if not isinstance(texts, (pa.Array, pa.ChunkedArray)):
+        texts = pa.array(texts, pa.string())
+    return pc.split_pattern_regex(pc.utf8_lower(texts.fill_null("")), TOKEN_SPLIT)
+
+
+def _string_buffers(arr):
+    """(offsets starting at 0, data bytes) of a large_string array"""
+    arr = pc.cast(arr, pa.large_string())
+    offsets = np.frombuffer(arr.buffers()[1], dtype=np.int64)[arr.offset:arr.offset + len(arr) + 1]
+    data = arr.buffers()[2]
+    data = data.to_pybytes()[offsets[0]:offsets[-1]] if data is not None else b""
+    return offsets - offsets[0], data
+
+
+def write_segment(table, path):
+    """Index a table of comments (video_id, text, type) into a new segment directory"""
+    tmp = path + ".tmp"
+    os.makedirs(tmp)
+    texts = table["text"].combine_chunks().fill_null("")
+    lists = tokenize(texts)
+    tokens = pc.list_flatten(lists)
+    rows = pc.list_parent_indices(lists)
+    keep = pc.not_equal(tokens, "")
+    encoded = pc.dictionary_encode(tokens.filter(keep))
+    rows = rows.filter(keep).to_numpy()
+
+    # Term ids follow the byte order of the terms so lookups can binary search
+    order = pc.sort_indices(encoded.dictionary).to_numpy()
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    pairs = np.unique((rank[encoded.indices.to_numpy()] << 32) | rows)
+    term_ids, postings = pairs >> 32, (pairs & 0xFFFFFFFF).astype(np.uint32)
+
+    term_offsets, term_data = _string_buffers(encoded.dictionary.take(pa.array(order)))
+    text_offsets, text_data = _string_buffers(texts)
+    np.save(os.path.join(tmp, "term_offsets.npy"), term_offsets)
+    np.save(os.path.join(tmp, "postings.npy"), postings)
+    np.save(os.path.join(tmp, "posting_offsets.npy"), np.searchsorted(term_ids, np.arange(len(order) + 1)))
+    np.save(os.path.join(tmp, "text_offsets.npy"), text_offsets)
+    for name, data in (("terms.bin", term_data), ("texts.bin", text_data)):
+        with open(os.path.join(tmp, name), "wb") as f:
+            f.write(data)
+    for column, codes_file, names_file in (("video_id", "video.npy", "videos.json"), ("type", "type.npy", "types.json")):
+        codes = pc.dictionary_encode(table[column].combine_chunks().cast(pa.string()).fill_null(""))
+        np.save(os.path.join(tmp, codes_file), codes.indices.to_numpy().astype(np.int32))
+        with open(os.path.join(tmp, names_file), "w") as f:
+            json.dump(codes.dictionary.to_pylist(), f)
+    os.replace(tmp, path)
+
+
+def _blob(path):
+    # np.memmap cannot map an empty file
+    return np.memmap(path, dtype=np.uint8, mode="r") if os.path.getsize(path) else np.zeros(0, dtype=np.uint8)
+
+
+class Segment:
+    """One memory-mapped segment of the index"""
+
+    def __init__(self, path):
+        self.path = path
+
+        def load(name):
+            return np.load(os.path.join(path, name), mmap_mode="r")
+
+        self.terms = _blob(os.path.join(path, "terms.bin"))
+        self.term_offsets = load("term_offsets.npy")
+        self.postings_data = load("postings.npy")
+        self.posting_offsets = load("posting_offsets.npy")
+        self.texts = _blob(os.path.join(path, "texts.bin"))
+        self.text_offsets = load("text_offsets.npy")
+        self.video = load("video.npy")
+        self.type = load("type.npy")
+        with open(os.path.join(path, "videos.json")) as f:
+            self.videos = json.load(f)
+        with open(os.path.join(path, "types.json")) as f:
+            self.types = json.load(f)
+        # Zero-copy Arrow view of the texts, for vectorised phrase checks
+        self.text_array = pa.LargeStringArray.from_buffers(len(self), pa.py_buffer(self.text_offsets),
+                                                           pa.py_buffer(self.texts))
+
+    def __len__(self):
+        return len(self.video)
+
+    def _term(self, i):
+        return self.terms[self.term_offsets[i]:self.term_offsets[i + 1]].tobytes()
+
+    def postings(self, term):
+        """Sorted row numbers containing `term`, empty if the term is not in the segment"""
+        term = term.encode()
+        lo, hi = 0, len(self.term_offsets) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < term:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self.term_offsets) - 1 and self._term(lo) == term:
+            return self.postings_data[self.posting_offsets[lo]:self.posting_offsets[lo + 1]]
+        return np.zeros(0, dtype=np.uint32)
+
+    def text(self, row):
+        return self.texts[self.text_offsets[row]:self.text_offsets[row + 1]].tobytes().decode()
+
+    def codes(self, names, values):
+        """Codes of the wanted video IDs / types that occur in this segment"""
+        wanted = set([values] if isinstance(values, str) else values)
+        return np.array([i for i, name in enumerate(names) if name in wanted], dtype=np.int32)
+
+    def match(self, phrases, video_id=None, type=None):
+        """Rows containing every word of every phrase, filtered by video_id / type.
+
+        Word order within phrases is checked afterwards, for all segments at once (see CommentIndex)."""
+        terms = sorted({term for phrase in phrases for term in phrase})
+        lists = sorted((self.postings(term) for term in terms), key=len)
+        if not lists:
+            rows = np.arange(len(self), dtype=np.uint32)
+        else:
+            rows = np.asarray(lists[0])
+            for postings in lists[1:]:
+                rows = np.intersect1d(rows, postings, assume_unique=True)
+        if video_id is not None:
+            rows = rows[np.isin(self.video[rows], self.codes(self.videos, video_id))]
+        if type is not None:
+            rows = rows[np.isin(self.type[rows], self.codes(self.types, type))]
+        return rows
+
+    def row(self, row):
+        return {"video_id": self.videos[self.video[row]], "type": self.types[self.type[row]], "text": self.text(row)}
+
+
+def _phrase_rows(tokens, parents, phrase, count):
+    """Which of `count` token lists (flattened into tokens / parents) hold the phrase's tokens in a row"""
+    size = len(tokens) - len(phrase) + 1
+    found = np.zeros(count, dtype=bool)
+    if size <= 0:
+        return found
+    hit = np.ones(size, dtype=bool)
+    for i, term in enumerate(phrase):
+        hit &= pc.equal(tokens.slice(i, size), term).to_numpy(zero_copy_only=False)
+        hit &= parents[i:i + size] == parents[:size]
+    found[parents[:size][hit]] = True
+    return found
+
+
+def parse_query(query):
+    """Token lists for the words and "quoted phrases" of a query"""
+    parts = [phrase or word for phrase, word in QUERY_RE.findall(query)]
+    phrases = [[token for token in tokens if token] for tokens in tokenize(parts).to_pylist()] if parts else []
+    return [phrase for phrase in phrases if phrase]
+
+
+class CommentIndex:
+    """Query API over every committed segment
+
+        index = CommentIndex()
+        index.search('semma "vera level"', type="tanglish", limit=10)
+    """
+
+    def __init__(self, directory=INDEX_DIR):
+        manifest = load_manifest(os.path.join(directory, "_manifest.json"))
+        self.segments = [Segment(os.path.join(directory, name)) for name in manifest["segments"]]
+
+    def __len__(self):
+        return sum(map(len, self.segments))
+
+    def matches(self, query, video_id=None, type=None):
+        """[(segment, matching rows), ...] for every word and "phrase" in `query`.
+
+        `video_id` and `type` take one value or a list."""
+        phrases = parse_query(query)
+        hits = [(segment, segment.match(phrases, video_id, type)) for segment in self.segments]
+        # Postings say every word is there; phrases also need the words in order. Candidates
+        # from all segments are tokenized in one call, as each call recompiles the pattern.
+        phrases = [phrase for phrase in phrases if len(phrase) > 1]
+        if phrases and any(len(rows) for _, rows in hits):
+            lists = tokenize(pa.concat_arrays([segment.text_array.take(pa.array(rows, pa.uint32()))
+                                               for segment, rows in hits]))
+            tokens, parents = pc.list_flatten(lists), pc.list_parent_indices(lists).to_numpy()
+            keep = np.ones(len(lists), dtype=bool)
+            for phrase in phrases:
+                keep &= _phrase_rows(tokens, parents, phrase, len(lists))
+            bounds = np.cumsum([0] + [len(rows) for _, rows in hits])
+            hits = [(segment, rows[keep[start:end]]) for (segment, rows), start, end in zip(hits, bounds, bounds[1:])]
+        return hits
+
+    def search(self, query, video_id=None, type=None, limit=100):
+        """Comments matching `query` as dicts (video_id, type, text), at most `limit`"""
+        results = []
+        for segment, rows in self.matches(query, video_id, type):
+            results += [segment.row(row) for row in rows[:limit - len(results)]]
+        return results
+
+    def count(self, query, video_id=None, type=None):
+        """Number of comments matching `query`"""
+        return sum(len(rows) for _, rows in self.matches(query, video_id, type))
+
+
+def load_manifest(path=MANIFEST_FILE):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {"segments": [], "next_segment": 1, "files": {}}
+
+
+def save_manifest(manifest):
+    """Write the manifest atomically; this is what commits new segments"""
+    tmp = MANIFEST_FILE + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, MANIFEST_FILE)
+
+
+def source_files(sources):
+    """Batch files in OUTPUT_DIR and SHARD_DIR plus any extra source files that exist"""
+    files = [os.path.join(directory, name) for directory in (OUTPUT_DIR, SHARD_DIR) for name in batch_files(directory)]
+    return files + [path for path in sources if os.path.exists(path)]
+
+
+def _new_segment(manifest):
+    name = f"seg-{manifest['next_segment']:05d}"
+    manifest["next_segment"] += 1
+    return name
+
+
+def merge_segments(manifest, old):
+    """Rewrite the segments named in `old` as one, in the place of the first of them.
+
+    The old directories are removed once the manifest no longer lists them."""
+    tables = []
+    for name in old:
+        segment = Segment(os.path.join(INDEX_DIR, name))
+        texts = pa.LargeStringArray.from_buffers(len(segment), pa.py_buffer(np.asarray(segment.text_offsets)),
+                                                 pa.py_buffer(segment.texts.tobytes()))
+        tables.append(pa.table({
+            "video_id": pa.array(segment.videos, pa.string()).take(pa.array(segment.video)),
+            "text": texts.cast(pa.string()),
+            "type": pa.array(segment.types, pa.string()).take(pa.array(segment.type)),
+        }))
+    name = _new_segment(manifest)
+    write_segment(pa.concat_tables(tables), os.path.join(INDEX_DIR, name))
+    position = manifest["segments"].index(old[0])
+    manifest["segments"] = [segment for segment in manifest["segments"] if segment not in old]
+    manifest["segments"].insert(position, name)
+    for file in manifest["files"].values():
+        if file["segment"] in old:
+            file["segment"] = name
+    save_manifest(manifest)
+    for segment in old:
+        shutil.rmtree(os.path.join(INDEX_DIR, segment))
+    print(f"🗜️ Merged {len(old)} segments")
+
+
+def _tier(rows):
+    tier = 0
+    while rows > TIER_ROWS * MERGE_FACTOR ** tier:
+        tier += 1
+    return tier
+
+
+def merge_tiers(manifest):
+    """Merge segments of the smallest size tier holding MERGE_FACTOR or more, until none does"""
+    while True:
+        rows = dict.fromkeys(manifest["segments"], 0)
+        for file in manifest["files"].values():
+            if file["segment"] in rows:
+                rows[file["segment"]] += file["rows"]
+        tiers = {}
+        for name in manifest["segments"]:
+            tiers.setdefault(_tier(rows[name]), []).append(name)
+        full = [names for _, names in sorted(tiers.items()) if len(names) >= MERGE_FACTOR]
+        if not full:
+            return
+        merge_segments(manifest, full[0])
+
+
+def build(sources=EXTRA_SOURCES):
+    """Index source files added since the last build"""
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    manifest = load_manifest()
+    # Segments from a build that crashed before saving the manifest
+    for name in os.listdir(INDEX_DIR):
+        if name.startswith("seg-") and name not in manifest["segments"]:
+            shutil.rmtree(os.path.join(INDEX_DIR, name))
+
+    start = time.perf_counter()
+    pending, rows, added = [], 0, 0
+
+    def flush():
+        nonlocal pending, rows
+        name = _new_segment(manifest)
+        write_segment(pa.concat_tables([table for _, _, table in pending]), os.path.join(INDEX_DIR, name))
+        manifest["segments"].append(name)
+        for path, stat, table in pending:
+            manifest["files"][path] = {"size": stat.st_size, "mtime": stat.st_mtime, "rows": table.num_rows,
+                                       "segment": name}
+        save_manifest(manifest)
+        pending, rows = [], 0
+
+    for path in source_files(sources):
+        stat = os.stat(path)
+        seen = manifest["files"].get(path)
+        if seen is not None:
+            if seen["size"] != stat.st_size or seen["mtime"] != stat.st_mtime:
+                print(f"⚠️ {path} changed after it was indexed, skipping")
+            continue
+        try:
+            table = read_batch(path).select(["video_id", "text", "type"])
+        except Exception as e:
+            print(f"⚠️ Error reading {path}: {str(e)}")
+            continue
+        pending.append((path, stat, table))
+        rows += table.num_rows
+        added += table.num_rows
+        if rows >= SEGMENT_ROWS:
+            flush()
+    if pending:
+        flush()
+
+    merge_tiers(manifest)
+    if added:
+        print(f"🔎 Indexed {added} comments in {time.perf_counter() - start:.1f}s "
+              f"({len(manifest['segments'])} segments)")
+    else:
+        print("✅ Index is up to date")
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the comment search index")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_cmd = commands.add_parser("build", help="index batch files added since the last build")
+    build_cmd.add_argument("sources", nargs="*", default=EXTRA_SOURCES, help="extra CSV/Parquet files to index")
+    search_cmd = commands.add_parser("search", help='find comments with every word / "phrase" of a query')
+    search_cmd.add_argument("query")
+    search_cmd.add_argument("--video-id", nargs="+")
+    search_cmd.add_argument("--type", nargs="+")
+    search_cmd.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build(args.sources)
+        return
+    index = CommentIndex()
+    start = time.perf_counter()
+    hits = index.matches(args.query, args.video_id, args.type)
+    elapsed = time.perf_counter() - start
+    shown = 0
+    for segment, rows in hits:
+        for row in rows[:args.limit - shown]:
+            result = segment.row(row)
+            print(f"{result['video_id']} [{result['type']}] {result['text']}")
+        shown += min(len(rows), args.limit - shown)
+    print(f"\n🔎 {sum(len(rows) for _, rows in hits)} matches in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
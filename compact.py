@@ -0,0 +1,240 @@
+"""Incrementally compact comment_data/ batch files into a dataset partitioned by type
+
+    python compact.py [--by-date] [--dedupe [id|exact|near]]
+
+Only batch files that are not yet in the manifest are read, from
+comment_data/ and, for `work.py merge`, the workers' shards (see work.py).
+Their rows are appended to
+comment_dataset/type=<type>/[date=<YYYYMMDD>/]part-<run>.parquet,
+one file per partition per run, so many small batch files end up in a few
+large row groups. Read the result with pyarrow.dataset:
+
+    ds.dataset("comment_dataset", partitioning="hive")
+
+--dedupe drops duplicate comments on the way in (see dedupe.py), checked
+against an index of everything compacted so far, comment_dataset/_dedupe.db.
+"""
+import argparse
+import json
+import os
+import re
+from datetime import datetime
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from dedupe import DedupeIndex, LEVELS
+from writer import StreamingParquetWriter
+
+# Configuration
+OUTPUT_DIR = "comment_data"
+DATASET_DIR = "comment_dataset"
+MANIFEST_FILE = os.path.join(DATASET_DIR, "_manifest.json")  # "_" keeps pyarrow.dataset from reading it
+DEDUPE_FILE = os.path.join(DATASET_DIR, "_dedupe.db")
+ROW_GROUP_SIZE = 100_000
+SCHEMA = pa.schema([
+    ("video_id", pa.string()),
+    ("comment_id", pa.string()),
+    ("text", pa.string()),
+    ("type", pa.string()),
+    ("published", pa.string()),   # Comment publish time (approximate, from YouTube's "2 days ago")
+    ("timestamp", pa.string()),   # When the comment was scraped
+])
+PART_RE = re.compile(r"part-(\d+)\.parquet$")
+FILE_DATE_RE = re.compile(r"_(\d{8})(?:_part\d+)?\.(?:parquet|csv)$")
+
+
+def load_manifest():
+    """Load the compaction manifest, or an empty one"""
+    if os.path.exists(MANIFEST_FILE):
+        with open(MANIFEST_FILE) as f:
+            return json.load(f)
+    return {"runs": 0, "files": {}, "counts": {}}
+
+
+def save_manifest(manifest):
+    """Write the manifest atomically; this is what commits a run"""
+    tmp = MANIFEST_FILE + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, MANIFEST_FILE)
+
+
+def discard_uncommitted(manifest):
+    """Remove part files from runs that crashed before their manifest was saved"""
+    for root, _, files in os.walk(DATASET_DIR):
+        for file in files:
+            match = PART_RE.search(file)
+            if (match and int(match.group(1)) > manifest["runs"]) or file.endswith(".tmp"):
+                os.remove(os.path.join(root, file))
+
+
+def batch_files(directory=OUTPUT_DIR):
+    """Batch files under `directory`, worker shards included, as sorted "/"-separated relative paths"""
+    files = []
+    for root, _, names in os.walk(directory):
+        rel = os.path.relpath(root, directory)
+        files += [name if rel == "." else f"{rel.replace(os.sep, '/')}/{name}"
+                  for name in names if name.endswith((".parquet", ".csv"))]
+    return sorted(files)
+
+
+def new_batch_files(manifest, sources=()):
+    """(name, path, stat) of batch files added (or changed) since the last run.
+
+    Files in OUTPUT_DIR are named by their relative path, those in the other
+    `sources` directories by their absolute one."""
+    new_files = []
+    for directory in [OUTPUT_DIR, *sources]:
+        for file in batch_files(directory):
+            path = os.path.join(directory, file)
+            stat = os.stat(path)
+            name = file if directory == OUTPUT_DIR else os.path.abspath(path).replace(os.sep, "/")
+            seen = manifest["files"].get(name)
+            if seen is None:
+                new_files.append((name, path, stat))
+            elif seen["size"] != stat.st_size or seen["mtime"] != stat.st_mtime:
+                print(f"⚠️ {name} changed after it was compacted, skipping")
+    return new_files
+
+
+def read_batch(path):
+    """Read one batch file into the common schema (older files lack some columns)"""
+    if path.endswith(".csv"):
+        table = pacsv.read_csv(path, parse_options=pacsv.ParseOptions(newlines_in_values=True),
+                               convert_options=pacsv.ConvertOptions(
+                                   column_types={name: pa.string() for name in SCHEMA.names}))
+    else:
+        table = pq.read_table(path)
+    columns = [as_string(table[name]) if name in table.column_names else pa.nulls(table.num_rows, pa.string())
+               for name in SCHEMA.names]
+    return pa.Table.from_arrays(columns, schema=SCHEMA)
+
+
+def as_string(column):
+    """String form of a batch column; timestamps keep the ISO format older batch files used"""
+    if pa.types.is_timestamp(column.type):
+        return pc.strftime(column, format="%Y-%m-%dT%H:%M:%S")
+    return column.cast(pa.string())
+
+
+def batch_date(file, table):
+    """Partition date for a batch: the file name's date suffix, else its first timestamp"""
+    match = FILE_DATE_RE.search(file)
+    if match:
+        return match.group(1)
+    first = table["timestamp"][0].as_py() if table.num_rows else None
+    return first[:10].replace("-", "") if first else "unknown"
+
+
+def index_dataset(index, manifest):
+    """Add the dataset's runs the dedupe index has not seen (compacted without --dedupe, or before it existed)"""
+    indexed = int(index.get("run", 0))
+    if indexed >= manifest["runs"]:
+        return
+    print(f"🧹 Indexing runs {indexed + 1}-{manifest['runs']} of the dataset for --dedupe")
+    for root, _, files in os.walk(DATASET_DIR):
+        for file in sorted(files):
+            match = PART_RE.search(file)
+            if match and indexed < int(match.group(1)) <= manifest["runs"]:
+                index.check(pq.read_table(os.path.join(root, file), columns=["comment_id", "text"]))
+    index.set("run", manifest["runs"])
+
+
+def compact(by_date=False, dedupe=None, sources=()):
+    """Append batch files added since the last run to the partitioned dataset.
+
+    Batch files come from OUTPUT_DIR and any other `sources` directories.
+
+    With `dedupe` ("id", "exact" or "near"; True means "id"), comments that
+    duplicate one already in the dataset or earlier in the new files are
+    dropped, e.g. videos scraped by two workers. The dedupe index is committed
+    with the manifest."""
+    os.makedirs(DATASET_DIR, exist_ok=True)
+    manifest = load_manifest()
+    discard_uncommitted(manifest)
+    # The partition layout is fixed by the first run
+    if manifest.setdefault("by_date", by_date) != by_date:
+        print(f"⚠️ Dataset was created with by_date={manifest['by_date']}, keeping that layout")
+        by_date = manifest["by_date"]
+
+    new_files = new_batch_files(manifest, sources)
+    if not new_files:
+        print("✅ Dataset is up to date")
+        return manifest["counts"]
+
+    run = manifest["runs"] + 1
+    writers = {}
+    index = None
+    duplicates = dict.fromkeys(LEVELS, 0)
+    if dedupe:
+        level = "id" if dedupe is True else dedupe
+        index = DedupeIndex(DEDUPE_FILE)
+        index_dataset(index, manifest)
+    for file, path, stat in new_files:
+        try:
+            table = read_batch(path)
+        except Exception as e:
+            print(f"⚠️ Error reading {file}: {str(e)}")
+            continue
+        rows = table.num_rows
+        if index is not None:
+            table, dropped = index.filter(table, level)
+            for name, count in dropped.items():
+                duplicates[name] += count
+
+        date = batch_date(file, table) if by_date else None
+        for type_name in pc.unique(table["type"]).to_pylist():
+            subset = table.filter(pc.equal(table["type"], type_name)) if type_name is not None \
+                else table.filter(pc.is_null(table["type"]))
+            partition = os.path.join(DATASET_DIR, f"type={type_name}")
+            if date:
+                partition = os.path.join(partition, f"date={date}")
+            if partition not in writers:
+                os.makedirs(partition, exist_ok=True)
+                writers[partition] = StreamingParquetWriter(
+                    os.path.join(partition, f"part-{run:05d}.parquet"), row_group_size=ROW_GROUP_SIZE)
+            writers[partition].write_table(subset.drop_columns(["type"]))
+            manifest["counts"][str(type_name)] = manifest["counts"].get(str(type_name), 0) + subset.num_rows
+
+        manifest["files"][file] = {"size": stat.st_size, "mtime": stat.st_mtime, "rows": table.num_rows, "run": run}
+        if rows != table.num_rows:
+            manifest["files"][file]["duplicates"] = rows - table.num_rows
+
+    for writer in writers.values():
+        writer.close()
+    manifest["runs"] = run
+    manifest["last_run"] = datetime.now().isoformat()
+    save_manifest(manifest)
+    if index is not None:
+        index.set("run", run)
+        index.commit()
+        index.close()
+
+    print(f"📚 Compacted {len(new_files)} new batch files into {len(writers)} partitions")
+    if sum(duplicates.values()):
+        print(f"🧹 Dropped {sum(duplicates.values())} duplicate comments ({duplicates['id']} by ID, "
+              f"{duplicates['exact']} exact, {duplicates['near']} near)")
+    return manifest["counts"]
+
+
+def combine_results(by_date=False, dedupe=None, sources=()):
+    """Compact new batch files and print per-type totals for the whole dataset"""
+    counts = compact(by_date=by_date, dedupe=dedupe, sources=sources)
+    print("\n✅ Final counts:")
+    for type_name, count in sorted(counts.items(), key=lambda item: -item[1]):
+        print(f"{type_name:<12} {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact new batch files into the partitioned comment dataset")
+    parser.add_argument("--by-date", action="store_true", help="also partition by batch date")
+    parser.add_argument("--dedupe", nargs="?", const="id", choices=LEVELS,
+                        help="drop duplicate comments: by comment ID (the default), also exact texts, "
+                             "or also near-duplicate texts (see dedupe.py)")
+    args = parser.parse_args()
+    combine_results(by_date=args.by_date, dedupe=args.dedupe)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""Find exact and near-duplicate comments without comparing every pair
+
+    python compact.py --dedupe near         # or id / exact; a plain --dedupe means id
+    python dedupe.py check comment_data/batch_1.parquet oldcomments.csv
+    python dedupe.py stats
+
+Three levels, each including the one before:
+- id: a comment ID seen before (the same comment scraped twice)
+- exact: the same text once case, punctuation, emoji and extra spaces are
+  dropped ("Super anna!!" and "super anna 🔥")
+- near: a text whose MinHash signature over character 4-grams agrees with an
+  earlier one's on at least NEAR_THRESHOLD of its values. Signatures are cut
+  into BANDS bands; only texts sharing a band's hash (LSH) are compared, so
+  the cost grows with the corpus, not with its square.
+
+DedupeIndex keeps what it has seen in SQLite (comment_dataset/_dedupe.db
+for compact.py), so each compaction only looks at its new batch files. Texts
+shorter than MIN_NEAR_CHARS are only matched exactly; "super bro" and
+"nice bro" are different comments.
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Configuration
+LEVELS = ("id", "exact", "near")
+NEAR_THRESHOLD = 0.8    # Share of equal signature values (~ Jaccard similarity of the 4-gram sets)
+SHINGLE = 4             # Characters per shingle
+NUM_PERM = 32           # MinHash values per text
+BANDS = 8               # LSH bands of NUM_PERM // BANDS values; texts ~0.6 similar or more usually share one
+MIN_NEAR_CHARS = 16     # Shorter normalized texts are only matched exactly
+BUCKET_NEIGHBOURS = 32  # Rows of the same batch compared within one LSH bucket
+MINHASH_CHUNK = 2048    # Texts hashed at once (bounds the shingles x permutations matrix)
+QUERY_CHUNK = 10_000    # Keys per SQL IN (...) lookup
+
+# Multiply-shift hash functions, one per permutation: (a * x + b) mod 2**64, top 32 bits
+_rng = np.random.default_rng(1)
+_A = _rng.integers(1, 1 << 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64)
+_BAND_MULT = _rng.integers(1, 1 << 62, NUM_PERM // BANDS, dtype=np.uint64) | np.uint64(1)
+_BAND_SALT = np.arange(BANDS, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+
+
+def normalize(texts):
+    """Lowercased NFKC text with everything but letters, marks and digits squeezed to single spaces"""
+    texts = pc.utf8_lower(pc.utf8_normalize(pc.fill_null(texts, ""), "NFKC"))
+    # Variation selectors and joiners are marks too, but only ever decorate emoji
+    texts = pc.replace_substring_regex(texts, r"[\x{FE00}-\x{FE0F}\x{200B}-\x{200D}]", "")
+    return pc.utf8_trim_whitespace(pc.replace_substring_regex(texts, r"[^\p{L}\p{M}\p{N}]+", " "))
+
+
+def hash64(values):
+    """Signed 64-bit hashes of strings, for SQLite INTEGER keys"""
+    return [int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "little", signed=True)
+            for value in values]
+
+
+def minhash(texts):
+    """(len(texts), NUM_PERM) uint32 signatures; every text needs at least SHINGLE characters"""
+    signatures = np.empty((len(texts), NUM_PERM), dtype=np.uint32)
+    for start in range(0, len(texts), MINHASH_CHUNK):
+        chunk = texts[start:start + MINHASH_CHUNK]
+        codes = np.frombuffer("".join(chunk).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        lengths = np.array([len(text) for text in chunk])
+        owner = np.repeat(np.arange(len(chunk)), lengths)
+        offset = np.arange(len(codes)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        # Rolling hash of every SHINGLE-character window, keeping those inside one text
+        count = len(codes) - SHINGLE + 1
+        shingles = np.zeros(count, dtype=np.uint64)
+        for k in range(SHINGLE):
+            shingles = shingles * np.uint64(1_000_003) + codes[k:k + count]
+        valid = offset[:count] <= (lengths - SHINGLE)[owner[:count]]
+        shingles = (shingles[valid] * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(32)
+        owner = owner[:count][valid]
+        # Permutations x shingles, so each text's minimum is taken over contiguous memory
+        values = ((_A[:, None] * shingles + _B[:, None]) >> np.uint64(32)).astype(np.uint32)
+        starts = np.searchsorted(owner, np.arange(len(chunk)))
+        signatures[start:start + len(chunk)] = np.minimum.reduceat(values, starts, axis=1).T
+    return signatures
+
+
+def band_keys(signatures):
+    """(n, BANDS) int64 LSH bucket keys, one per band"""
+    bands = signatures.astype(np.uint64).reshape(len(signatures), BANDS, NUM_PERM // BANDS)
+    return ((bands * _BAND_MULT).sum(axis=2) + _BAND_SALT).view(np.int64)
+
+
+class DedupeIndex:
+    """Comment IDs, normalized-text hashes and MinHash LSH buckets of every comment kept so far.
+
+    Changes stay in an open transaction until commit(), so a caller can
+    commit them together with its own output (compact.py does so after its
+    manifest) or roll them back (dedupe.py check)."""
+
+    def __init__(self, path, threshold=NEAR_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS ids (hash INTEGER PRIMARY KEY);
+            CREATE TABLE IF NOT EXISTS texts (hash INTEGER PRIMARY KEY);
+            CREATE TABLE IF NOT EXISTS signatures (id INTEGER PRIMARY KEY, signature BLOB NOT NULL);
+            CREATE TABLE IF NOT EXISTS bands (key INTEGER NOT NULL, id INTEGER NOT NULL, PRIMARY KEY (key, id))
+                WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+
+    def _query(self, sql, keys):
+        """Rows of `sql` (with one "{}" for the IN list) for `keys`, looked up QUERY_CHUNK at a time"""
+        keys = list(keys)
+        rows = []
+        for start in range(0, len(keys), QUERY_CHUNK):
+            chunk = keys[start:start + QUERY_CHUNK]
+            rows += self.db.execute(sql.format(",".join("?" * len(chunk))), chunk).fetchall()
+        return rows
+
+    def _new(self, table, hashes, candidates):
+        """Mask over `candidates` (row numbers) of rows whose hash is neither indexed nor on an earlier row"""
+        known = {row[0] for row in self._query(f"SELECT hash FROM {table} WHERE hash IN ({{}})",
+                                               {hashes[i] for i in candidates})}
+        new = np.zeros(len(candidates), dtype=bool)
+        for n, i in enumerate(candidates):
+            if hashes[i] not in known:
+                known.add(hashes[i])
+                new[n] = True
+        return new
+
+    def _near(self, signatures):
+        """Mask of signatures that match neither an indexed one nor an earlier one here.
+
+        Candidate pairs (sharing a band key) are verified in bulk. Within the
+        batch a row is compared with the BUCKET_NEIGHBOURS rows before it in
+        each bucket, so a bucket of thousands of similar texts stays linear."""
+        n = len(signatures)
+        keys = band_keys(signatures).ravel()
+        rows = np.repeat(np.arange(n), BANDS)
+        new = np.ones(n, dtype=bool)
+
+        # Against the index: every stored signature in one of the row's buckets
+        found = self._query("SELECT key, id FROM bands WHERE key IN ({})", np.unique(keys).tolist())
+        found = np.array(found, dtype=np.int64).reshape(-1, 2)
+        if len(found):
+            found = found[np.argsort(found[:, 0], kind="stable")]
+            lo = np.searchsorted(found[:, 0], keys, "left")
+            counts = np.searchsorted(found[:, 0], keys, "right") - lo
+            pair_rows = np.repeat(rows, counts)
+            # lo, lo + 1, ... for every (row, band) entry's run of matches
+            offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            pair_sids = found[np.repeat(lo, counts) + offsets, 1]
+            sids, which = np.unique(pair_sids, return_inverse=True)
+            blobs = dict(self._query("SELECT id, signature FROM signatures WHERE id IN ({})", sids.tolist()))
+            stored = np.frombuffer(b"".join(blobs[sid] for sid in sids.tolist()), dtype=np.uint32).reshape(-1, NUM_PERM)
+            similar = (signatures[pair_rows] == stored[which]).mean(axis=1) >= self.threshold
+            new[pair_rows[similar]] = False
+
+        # Within the batch: neighbours in the same bucket, the earlier row winning if it is kept itself
+        order = np.lexsort((rows, keys))
+        keys, rows = keys[order], rows[order]
+        earlier, later = [], []
+        for distance in range(1, BUCKET_NEIGHBOURS + 1):
+            same = keys[distance:] == keys[:-distance]
+            if not same.any():
+                break
+            earlier.append(rows[:-distance][same])
+            later.append(rows[distance:][same])
+        if earlier:
+            earlier, later = np.concatenate(earlier), np.concatenate(later)
+            similar = (signatures[earlier] == signatures[later]).mean(axis=1) >= self.threshold
+            earlier, later = earlier[similar], later[similar]
+            for i, j in sorted(zip(earlier.tolist(), later.tolist()), key=lambda pair: pair[1]):
+                if new[i] and i != j:
+                    new[j] = False
+        return new
+
+    def check(self, table):
+        """Index a table's comments; returns {"id", "exact", "near"}: per row, whether it duplicates
+        something indexed or an earlier row at that level. Only new comments are added.
+
+        Levels cascade: a row is only checked for exact duplicates if its ID is
+        new, and for near ones if its text is new too."""
+        n = table.num_rows
+        flags = {level: np.zeros(n, dtype=bool) for level in LEVELS}
+        ids = table["comment_id"].to_pylist()
+        with_id = [i for i, cid in enumerate(ids) if cid]
+        id_hashes = dict(zip(with_id, hash64([ids[i] for i in with_id])))
+        flags["id"][with_id] = ~self._new("ids", id_hashes, with_id)
+
+        texts = normalize(table["text"]).to_pylist()
+        rest = [i for i in range(n) if not flags["id"][i] and texts[i]]
+        text_hashes = dict(zip(rest, hash64([texts[i] for i in rest])))
+        flags["exact"][rest] = ~self._new("texts", text_hashes, rest)
+
+        rest = [i for i in rest if not flags["exact"][i] and len(texts[i]) >= MIN_NEAR_CHARS]
+        signatures = minhash([texts[i] for i in rest])
+        new = self._near(signatures) if rest else np.zeros(0, dtype=bool)
+        flags["near"][rest] = ~new
+
+        self.db.executemany("INSERT OR IGNORE INTO ids VALUES (?)", ((id_hashes[i],) for i in with_id))
+        self.db.executemany("INSERT OR IGNORE INTO texts VALUES (?)", ((h,) for h in text_hashes.values()))
+        first = (self.db.execute("SELECT MAX(id) FROM signatures").fetchone()[0] or 0) + 1
+        kept = signatures[new]
+        sids = range(first, first + len(kept))
+        self.db.executemany("INSERT INTO signatures VALUES (?, ?)", zip(sids, (sig.tobytes() for sig in kept)))
+        # In key order, so the inserts walk the bands B-tree instead of jumping around it
+        bands = np.column_stack((band_keys(kept).ravel(), np.repeat(np.arange(first, first + len(kept)), BANDS)))
+        self.db.executemany("INSERT OR IGNORE INTO bands VALUES (?, ?)", bands[np.argsort(bands[:, 0])].tolist())
+        return flags
+
+    def filter(self, table, level="near"):
+        """(rows of `table` that are not duplicates at `level` or below, {level: rows dropped})"""
+        flags = self.check(table)
+        drop = np.zeros(table.num_rows, dtype=bool)
+        dropped = {}
+        for name in LEVELS[:LEVELS.index(level) + 1]:
+            dropped[name] = int((flags[name] & ~drop).sum())
+            drop |= flags[name]
+        return table.filter(pa.array(~drop)), dropped
+
+    def get(self, key, default=None):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set(self, key, value):
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, str(value)))
+
+    def stats(self):
+        return {table: self.db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("ids", "texts", "signatures", "bands")}
+
+    def commit(self):
+        self.db.commit()
+
+    def rollback(self):
+        self.db.rollback()
+
+    def close(self):
+        self.db.close()
+
+
+def main():
+    from compact import read_batch, DEDUPE_FILE
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("check", "stats"))
+    parser.add_argument("files", nargs="*", help="check: batch files (.parquet / .csv)")
+    parser.add_argument("--index", default=DEDUPE_FILE, help="index to check against (left unchanged)")
+    args = parser.parse_args()
+
+    index = DedupeIndex(args.index if os.path.exists(args.index) else ":memory:")
+    try:
+        if args.command == "stats":
+            stats = index.stats()
+            print(f"🧹 {stats['ids']:,} comment IDs, {stats['texts']:,} texts, {stats['signatures']:,} signatures "
+                  f"in {stats['bands']:,} LSH entries")
+            return
+        total = {level: 0 for level in LEVELS}
+        rows = 0
+        for path in args.files:
+            table = read_batch(path)
+            _, dropped = index.filter(table)
+            rows += table.num_rows
+            for level, count in dropped.items():
+                total[level] += count
+            print(f"{path}: {table.num_rows:,} rows, {sum(dropped.values()):,} duplicates "
+                  f"({dropped['id']:,} by ID, {dropped['exact']:,} exact, {dropped['near']:,} near)")
+        print(f"🧹 {sum(total.values()):,} of {rows:,} comments are duplicates "
+              f"({total['id']:,} by ID, {total['exact']:,} exact, {total['near']:,} near)")
+    finally:
+        # check never changes the index
+        index.rollback()
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
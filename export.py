@@ -0,0 +1,136 @@
+"""Export batch files to CSV or JSON lines without loading them into memory
+
+    python export.py code_mixed_comments.csv --type code_mixed
+    python export.py out.jsonl 'comment_data/batch_*_2025*.parquet' --video-id abc123def45 --columns video_id text
+
+Files are read one at a time, a record batch at a time. Column selection and
+the --type / --video-id filters go to the Parquet reader, so row groups whose
+statistics rule them out are skipped and unused columns are never decoded.
+Memory stays around one batch no matter how many files are exported. Columns
+are written as strings in compact.SCHEMA's form, whatever layout each batch
+file has.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+from compact import as_string, OUTPUT_DIR, SCHEMA
+from work import WORK_DIR, SHARDS
+
+# Configuration
+BATCH_ROWS = 64_000  # Rows per record batch read and written
+# Worker shards included, when the work directory is the default one
+DEFAULT_SOURCES = [os.path.join(OUTPUT_DIR, "**", "*.parquet"), os.path.join(WORK_DIR, SHARDS, "**", "*.parquet")]
+FORMATS = ("csv", "jsonl")
+
+
+def source_files(patterns):
+    """Files matching any of the glob patterns, each once, in name order"""
+    files = sorted({path for pattern in patterns for path in glob.glob(pattern, recursive=True)})
+    return [path for path in files if path.endswith((".parquet", ".csv"))]
+
+
+def build_filter(types=None, video_ids=None):
+    """Dataset filter expression for the given types / video IDs, or None for every row"""
+    expression = None
+    for field, values in (("type", types), ("video_id", video_ids)):
+        if values:
+            condition = ds.field(field).isin(list(values))
+            expression = condition if expression is None else expression & condition
+    return expression
+
+
+def file_dataset(path):
+    if path.endswith(".csv"):
+        return ds.dataset(path, format=ds.CsvFileFormat(parse_options=pacsv.ParseOptions(newlines_in_values=True)))
+    return ds.dataset(path)
+
+
+def read_batches(path, columns, types=None, video_ids=None, batch_rows=BATCH_ROWS):
+    """Record batches of one file with `columns` as strings, filtered in the reader"""
+    dataset = file_dataset(path)
+    names = dataset.schema.names
+    if (types and "type" not in names) or (video_ids and "video_id" not in names):
+        return  # Nothing in this file can match
+    present = [name for name in columns if name in names]
+    scanner = dataset.scanner(columns=present, filter=build_filter(types, video_ids), batch_size=batch_rows,
+                              batch_readahead=1, fragment_readahead=1)
+    schema = pa.schema([(name, pa.string()) for name in columns])
+    for batch in scanner.to_batches():
+        if batch.num_rows:
+            yield pa.RecordBatch.from_arrays(
+                [as_string(batch.column(name)) if name in present else pa.nulls(batch.num_rows, pa.string())
+                 for name in columns], schema=schema)
+
+
+class JsonLinesWriter:
+    """One JSON object per row, matching pyarrow.csv.CSVWriter's write / close"""
+
+    def __init__(self, sink):
+        self.sink = sink
+
+    def write(self, batch):
+        self.sink.write("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in batch.to_pylist()).encode())
+
+    def close(self):
+        self.sink.flush()
+
+
+def export(output, patterns=DEFAULT_SOURCES, columns=SCHEMA.names, types=None, video_ids=None, fmt=None,
+           batch_rows=BATCH_ROWS):
+    """Stream matching rows from the files in `patterns` to `output` ("-" for stdout); returns (rows, files)"""
+    fmt = fmt or ("jsonl" if output.endswith((".jsonl", ".json")) else "csv")
+    files = source_files(patterns)
+    sink = sys.stdout.buffer if output == "-" else open(output + ".tmp", "wb")
+    schema = pa.schema([(name, pa.string()) for name in columns])
+    writer = pacsv.CSVWriter(sink, schema) if fmt == "csv" else JsonLinesWriter(sink)
+    rows = 0
+    try:
+        for path in files:
+            for batch in read_batches(path, columns, types, video_ids, batch_rows):
+                writer.write(batch)
+                rows += batch.num_rows
+        writer.close()
+    except BaseException:
+        # Bad filter, full disk, Ctrl-C: leave no partial .tmp behind either
+        if sink is not sys.stdout.buffer:
+            sink.close()
+            os.remove(output + ".tmp")
+        raise
+    if sink is not sys.stdout.buffer:
+        sink.close()
+    if output != "-":
+        # Renamed only once complete, so a failed export never leaves a truncated file behind
+        os.replace(output + ".tmp", output)
+    return rows, len(files)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output", help="output file (.csv or .jsonl), or - for stdout")
+    parser.add_argument("sources", nargs="*", default=DEFAULT_SOURCES,
+                        help=f"batch file globs (default: {DEFAULT_SOURCES[0]})")
+    parser.add_argument("--format", choices=FORMATS, help="default: from the output file's extension")
+    parser.add_argument("--columns", nargs="+", default=SCHEMA.names, choices=SCHEMA.names, metavar="COLUMN",
+                        help=f"columns to export, from {', '.join(SCHEMA.names)}")
+    parser.add_argument("--type", nargs="+", dest="types", metavar="TYPE", help="only these comment types")
+    parser.add_argument("--video-id", nargs="+", dest="video_ids", default=[], metavar="ID",
+                        help="only these videos")
+    parser.add_argument("--video-ids-file", help="only the videos listed in this file, one per line")
+    args = parser.parse_args()
+
+    video_ids = list(args.video_ids)
+    if args.video_ids_file:
+        with open(args.video_ids_file) as f:
+            video_ids += [line.strip() for line in f if line.strip()]
+    rows, files = export(args.output, args.sources, args.columns, args.types, video_ids, args.format)
+    if args.output != "-":
+        print(f"✅ Exported {rows:,} rows from {files} files to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,650 @@
+import asyncio
+import contextlib
+import json
+import os
+import random
+import signal
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from tqdm import tqdm
+from metrics import METRICS
+
+# Configuration
+REQUESTS_PER_SECOND = 2.0  # Sustained page requests per second across all videos
+REQUEST_BURST = 5          # Requests allowed back-to-back before pacing kicks in
+MAX_IN_FLIGHT = 200        # Video comment streams open at the same time
+PAGE_SIZE = 20             # Comments per continuation page returned by YouTube
+NEWEST_KEPT = 5            # Newest top-level comment IDs remembered per video for incremental re-scrapes
+
+# Adaptive (AIMD) control of request rate and concurrency
+MIN_RATE = 0.2             # Requests per second never go below this
+MAX_RATE = 20.0
+RATE_STEP = 0.5            # Additive increase per healthy window
+START_CONCURRENCY = 10
+MIN_CONCURRENCY = 1
+WINDOW_REQUESTS = 20       # Requests per evaluation window
+LATENCY_TARGET = 3.0       # Seconds; a slower p90 page latency counts as server pressure
+ERROR_THRESHOLD = 0.1      # Share of failed requests in a window that triggers a back-off
+RATE_LOG_FILE = "rate_log.jsonl"
+
+# Shutdown on SIGINT / SIGTERM or at the deadline
+DRAIN_SECONDS = 5          # Grace for in-flight page requests before their videos are checkpointed anyway
+
+# Downloader sessions (HTTP keep-alive connections plus YouTube's consent cookies) reused across videos
+SESSION_MAX_USES = 200     # Videos per session before it is replaced with a fresh one
+SESSION_IDLE_TIMEOUT = 60  # Seconds; pooled connections idle longer are dropped before reuse (cookies are kept)
+
+# Page request outcomes reported to the limiter
+OK = "ok"
+ERROR = "error"
+THROTTLED = "throttled"
+
+
+class ThrottledError(RuntimeError):
+    """Raised by a comment source when the server says to slow down"""
+
+
+class Cancelled(Exception):
+    """A fetch cut short by a shutdown; the comments fetched so far are kept and the video resumes next run"""
+
+
+class Shutdown:
+    """Cooperative stop for a run, requested by SIGINT / SIGTERM or once `deadline` (epoch seconds) passes.
+
+    Once requested, fetches send no new page requests and give the ones in
+    flight `drain` seconds; then every unfinished video is handed to the writer
+    with a Cancelled error, so its comments are flushed and its progress saved.
+    A second signal interrupts at once."""
+
+    def __init__(self, deadline=None, drain=DRAIN_SECONDS):
+        self.deadline = deadline
+        self.drain = drain
+        self.reason = None
+        self.signum = None
+        self.at = None
+        self.handlers = {}
+
+    def request(self, reason):
+        if self.at is None:
+            self.at = time.time()
+            self.reason = reason
+            print(f"\n🛑 Stopping ({reason}): finishing in-flight pages for up to {self.drain:.0f}s, then saving")
+            METRICS.inc("shutdowns_total", reason="signal" if self.signum else "deadline")
+
+    @property
+    def requested(self):
+        if self.at is None and self.deadline is not None and time.time() >= self.deadline:
+            self.request("max runtime reached")
+        return self.at is not None
+
+    def drained(self):
+        """Whether the grace for in-flight requests is over"""
+        return self.requested and time.time() >= self.at + self.drain
+
+    def sleep(self, seconds):
+        """time.sleep that returns early once a stop is requested"""
+        end = time.time() + seconds
+        while not self.requested and time.time() < end:
+            time.sleep(min(0.5, end - time.time()))
+
+    def _handle(self, signum, frame):
+        if self.signum is not None:
+            raise KeyboardInterrupt
+        self.signum = signum
+        self.request(signal.Signals(signum).name)
+
+    def install(self):
+        """Handle SIGINT and SIGTERM until restore(); call from the main thread"""
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            self.handlers[signum] = signal.signal(signum, self._handle)
+        return self
+
+    def restore(self):
+        for signum, handler in self.handlers.items():
+            signal.signal(signum, handler)
+        self.handlers = {}
+
+    def exit(self):
+        """After a signal, with everything saved: exit with 128 + the signal number, as if killed by it.
+
+        Downloader threads stuck in a request are not waited for: the
+        downloader's blocking requests cannot be interrupted and retry for a
+        long time, and the interpreter would otherwise join their threads."""
+        if self.signum is None:
+            return
+        stuck = [thread for thread in threading.enumerate()
+                 if thread is not threading.main_thread() and not thread.daemon and thread.is_alive()]
+        if stuck:
+            print(f"👋 Not waiting for {len(stuck)} blocked requests; everything fetched is saved")
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(128 + self.signum)
+        sys.exit(128 + self.signum)
+
+
+class TokenBucket:
+    """Global rate limiter shared by every in-flight video"""
+
+    def __init__(self, rate=REQUESTS_PER_SECOND, burst=REQUEST_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.loop = None
+
+    def _bind(self):
+        # asyncio primitives belong to one event loop, and each batch runs its own
+        loop = asyncio.get_running_loop()
+        if loop is not self.loop:
+            self.loop = loop
+            self.lock = asyncio.Lock()
+            self.cond = asyncio.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens=1):
+        """Wait until `tokens` requests may be sent"""
+        self._bind()
+        start = time.monotonic()
+        async with self.lock:
+            self._refill()
+            while self.tokens < tokens:
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= tokens
+        METRICS.inc("rate_limit_wait_seconds_total", time.monotonic() - start)
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        """Concurrency gate around one video; a plain bucket never limits it"""
+        yield
+
+    async def record(self, latency, outcome):
+        """Feedback after each page request; a plain bucket ignores it"""
+
+
+class AdaptiveLimiter(TokenBucket):
+    """AIMD controller for rate and concurrency.
+
+    Every WINDOW_REQUESTS page requests, a healthy window (few errors, p90 latency
+    under LATENCY_TARGET) adds RATE_STEP req/s and one concurrent video; an
+    unhealthy window or any throttle response halves both. Each decision is
+    appended to `log_file` as a JSON line."""
+
+    def __init__(self, rate=REQUESTS_PER_SECOND, burst=REQUEST_BURST, concurrency=START_CONCURRENCY,
+                 max_concurrency=MAX_IN_FLIGHT, min_rate=MIN_RATE, max_rate=MAX_RATE, log_file=RATE_LOG_FILE):
+        super().__init__(rate, burst)
+        self.concurrency = concurrency
+        self.max_concurrency = max_concurrency
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.log_file = log_file
+        self.in_flight = 0
+        self.window = []
+        self.last_decrease = 0.0
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        self._bind()
+        start = time.monotonic()
+        async with self.cond:
+            await self.cond.wait_for(lambda: self.in_flight < self.concurrency)
+            self.in_flight += 1
+        METRICS.inc("concurrency_wait_seconds_total", time.monotonic() - start)
+        METRICS.set("videos_in_flight", self.in_flight)
+        try:
+            yield
+        finally:
+            async with self.cond:
+                self.in_flight -= 1
+                self.cond.notify_all()
+            METRICS.set("videos_in_flight", self.in_flight)
+
+    async def record(self, latency, outcome):
+        self._bind()
+        self.window.append((latency, outcome))
+        if outcome == THROTTLED:
+            # Back off at once, but only once per window's worth of time
+            if time.monotonic() - self.last_decrease > WINDOW_REQUESTS / self.rate:
+                await self._adjust(decrease=True, reason="throttled")
+        elif len(self.window) >= WINDOW_REQUESTS:
+            latencies = sorted(lat for lat, _ in self.window)
+            p90 = latencies[max(0, int(len(latencies) * 0.9) - 1)]
+            errors = sum(out != OK for _, out in self.window) / len(self.window)
+            if errors > ERROR_THRESHOLD:
+                await self._adjust(decrease=True, reason=f"errors {errors:.0%}")
+            elif p90 > LATENCY_TARGET:
+                await self._adjust(decrease=True, reason=f"p90 latency {p90:.1f}s")
+            else:
+                await self._adjust(decrease=False, reason="healthy")
+
+    async def _adjust(self, decrease, reason):
+        old_rate, old_concurrency = self.rate, self.concurrency
+        if decrease:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.concurrency = max(MIN_CONCURRENCY, self.concurrency // 2)
+            self.last_decrease = time.monotonic()
+            print(f"🐢 Backing off ({reason}): {old_rate:.2f} → {self.rate:.2f} req/s, "
+                  f"{old_concurrency} → {self.concurrency} videos")
+        else:
+            self.rate = min(self.max_rate, self.rate + RATE_STEP)
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+            async with self.cond:
+                self.cond.notify_all()
+        METRICS.set("request_rate", self.rate)
+        METRICS.set("concurrency_limit", self.concurrency)
+
+        latencies = [lat for lat, _ in self.window]
+        self.log({"time": datetime.now().isoformat(), "rate": round(self.rate, 3), "concurrency": self.concurrency,
+                  "reason": reason, "requests": len(self.window),
+                  "errors": sum(out != OK for _, out in self.window),
+                  "mean_latency": round(sum(latencies) / len(latencies), 3) if latencies else None})
+        self.window = []
+
+    def log(self, entry):
+        if self.log_file:
+            with open(self.log_file, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+
+def _next_page(comments, size):
+    """Pull up to `size` comments from a blocking downloader generator"""
+    page = []
+    for comment in comments:
+        page.append(comment)
+        if len(page) >= size:
+            break
+    return page
+
+
+def _raise_on_throttle(response, *args, **kwargs):
+    """requests response hook: fail on a 429 at once instead of letting the downloader sleep and retry it"""
+    if response.status_code == 429:
+        raise ThrottledError(f"429 Too Many Requests ({response.url})")
+
+
+def _connection_counts(downloader):
+    """(connections opened, requests sent) so far by a downloader's requests.Session"""
+    connections = sent = 0
+    session = getattr(downloader, "session", None)
+    for adapter in (session.adapters.values() if session is not None else ()):
+        manager = getattr(adapter, "poolmanager", None)
+        for key in (manager.pools.keys() if manager is not None else ()):
+            pool = manager.pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+                sent += pool.num_requests
+    return connections, sent
+
+
+class SessionPool:
+    """YoutubeCommentDownloader instances handed out one video at a time and reused afterwards.
+
+    Each downloader owns a requests.Session, so a reused one skips the TCP/TLS
+    handshake and the consent redirect. A downloader whose video failed, or that
+    has served SESSION_MAX_USES videos, is closed instead of going back to the
+    pool. Thread-safe, so the scripts' thread pools can share one."""
+
+    def __init__(self, factory=None, max_uses=SESSION_MAX_USES, idle_timeout=SESSION_IDLE_TIMEOUT):
+        self.factory = factory
+        self.max_uses = max_uses
+        self.idle_timeout = idle_timeout
+        self.lock = threading.Lock()
+        self.idle = []
+        self.info = {}  # id(downloader) -> uses, connections and requests counted so far, release time
+        self.counts = {"created": 0, "reused": 0, "recycled": 0, "connections": 0, "requests": 0}
+
+    def _new(self):
+        if self.factory is not None:
+            return self.factory()
+        from youtube_comment_downloader import YoutubeCommentDownloader
+        return YoutubeCommentDownloader()
+
+    def acquire(self):
+        """(downloader, reused) for one video; hand it back with release()"""
+        with self.lock:
+            downloader = self.idle.pop() if self.idle else None
+            outcome = "reused" if downloader is not None else "created"
+            self.counts[outcome] += 1
+            METRICS.set("sessions_idle", len(self.idle))
+        METRICS.inc("sessions_total", outcome=outcome)
+        if downloader is None:
+            downloader = self._new()
+            self.info[id(downloader)] = {"uses": 0, "connections": 0, "requests": 0, "released": time.monotonic()}
+        elif time.monotonic() - self.info[id(downloader)]["released"] > self.idle_timeout:
+            # The server has probably closed these; a fresh connection beats a failed first request
+            self._count_connections(downloader)
+            session = getattr(downloader, "session", None)
+            for adapter in (session.adapters.values() if session is not None else ()):
+                if hasattr(adapter, "poolmanager"):
+                    adapter.poolmanager.clear()
+            self.info[id(downloader)].update(connections=0, requests=0)
+        return downloader, outcome == "reused"
+
+    def _count_connections(self, downloader):
+        info = self.info[id(downloader)]
+        connections, sent = _connection_counts(downloader)
+        new_connections, new_requests = connections - info["connections"], sent - info["requests"]
+        info.update(connections=connections, requests=sent)
+        with self.lock:
+            self.counts["connections"] += new_connections
+            self.counts["requests"] += new_requests
+        METRICS.inc("http_connections_total", new_connections)
+        METRICS.inc("http_requests_total", new_requests)
+
+    def release(self, downloader, broken=False):
+        """Return a downloader after its video; `broken` ones (an error mid-video) are closed"""
+        self._count_connections(downloader)
+        info = self.info[id(downloader)]
+        info["uses"] += 1
+        info["released"] = time.monotonic()
+        reason = "error" if broken else "uses" if info["uses"] >= self.max_uses else None
+        if reason is None:
+            with self.lock:
+                self.idle.append(downloader)
+                METRICS.set("sessions_idle", len(self.idle))
+            return
+        with self.lock:
+            self.counts["recycled"] += 1
+        METRICS.inc("sessions_recycled_total", reason=reason)
+        self._close(downloader)
+
+    @contextlib.contextmanager
+    def session(self):
+        """A downloader for the duration of the block, recycled if the block raises"""
+        downloader, _ = self.acquire()
+        try:
+            yield downloader
+        except BaseException:
+            self.release(downloader, broken=True)
+            raise
+        self.release(downloader)
+
+    def _close(self, downloader):
+        del self.info[id(downloader)]
+        session = getattr(downloader, "session", None)
+        if session is not None:
+            session.close()
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for downloader in idle:
+            self._close(downloader)
+
+    def __str__(self):
+        c = self.counts
+        videos = c["created"] + c["reused"]
+        summary = (f"🔌 Sessions: {c['created']} created, {c['reused']} reused ({c['reused'] / max(videos, 1):.0%} of videos), "
+                   f"{c['recycled']} recycled")
+        if c["requests"]:
+            summary += (f" | {c['connections']} connections for {c['requests']} requests "
+                        f"({1 - c['connections'] / c['requests']:.0%} on a reused connection)")
+        return summary
+
+
+class DownloaderSource:
+    """Async comment source backed by youtube_comment_downloader, drawing sessions from a SessionPool"""
+
+    def __init__(self, page_size=PAGE_SIZE, max_threads=MAX_IN_FLIGHT, sessions=None):
+        self.page_size = page_size
+        self.executor = ThreadPoolExecutor(max_workers=max_threads)
+        self.sessions = sessions or SessionPool()
+
+    async def pages(self, video_id):
+        """Yield lists of raw comment dicts, one per continuation page"""
+        loop = asyncio.get_running_loop()
+        downloader, reused = self.sessions.acquire()
+        session = getattr(downloader, "session", None)
+        if session is not None and _raise_on_throttle not in session.hooks["response"]:
+            # The downloader retries a 429 itself and then ends the stream as if the video had no
+            # more comments; raising lets the limiter back off and the video go to the retry queue
+            session.hooks["response"].append(_raise_on_throttle)
+        broken = True
+        try:
+            # Pacing is done by the token bucket, so skip the downloader's own sleep
+            comments = downloader.get_comments(video_id, sleep=0)
+            start = time.perf_counter()
+            page = await loop.run_in_executor(self.executor, _next_page, comments, self.page_size)
+            # Includes the watch page and any consent redirect, which a reused session skips
+            METRICS.observe("first_page_seconds", time.perf_counter() - start, session="reused" if reused else "new")
+            while page:
+                yield page
+                page = await loop.run_in_executor(self.executor, _next_page, comments, self.page_size)
+            broken = False
+        except GeneratorExit:
+            broken = False  # The caller stopped reading; nothing is in flight on this session
+            raise
+        except ThrottledError:
+            broken = False  # The server is busy, not the session
+            raise
+        finally:
+            self.sessions.release(downloader, broken)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.sessions.close()
+
+
+class FakeSource:
+    """Local stand-in for YouTube that simulates per-page latency (comments come newest first)"""
+
+    def __init__(self, comments_per_video=100, page_size=PAGE_SIZE, latency=(0.05, 0.2), seed=0):
+        self.comments_per_video = comments_per_video
+        self.page_size = page_size
+        self.latency = latency
+        self.random = random.Random(seed)
+
+    async def pages(self, video_id):
+        for start in range(0, self.comments_per_video, self.page_size):
+            await asyncio.sleep(self.random.uniform(*self.latency))
+            end = min(start + self.page_size, self.comments_per_video)
+            yield [{"cid": f"{video_id}-{i}", "text": f"super anna video {i}", "time_parsed": time.time() - 60 * i}
+                   for i in range(start, end)]
+
+    def close(self):
+        pass
+
+
+class ThrottlingFakeSource(FakeSource):
+    """FakeSource that throttles once requests exceed `capacity` per second"""
+
+    def __init__(self, capacity=10, **kwargs):
+        super().__init__(**kwargs)
+        self.capacity = capacity
+        self.recent = deque()
+
+    async def pages(self, video_id):
+        async for page in super().pages(video_id):
+            now = time.monotonic()
+            self.recent.append(now)
+            while self.recent[0] < now - 1:
+                self.recent.popleft()
+            if len(self.recent) > self.capacity:
+                raise ThrottledError("429 Too Many Requests")
+            yield page
+
+
+async def _record_page(limiter, start, outcome):
+    """Report one page request to the limiter and the metrics"""
+    latency = time.monotonic() - start
+    METRICS.observe("page_seconds", latency)
+    METRICS.inc("pages_total", outcome=outcome)
+    await limiter.record(latency, outcome)
+
+
+async def _until_drained(awaitable, shutdown):
+    """Await `awaitable`, raising Cancelled instead once a requested shutdown's grace is over"""
+    if shutdown is None:
+        return await awaitable
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=0.5)
+            if done:
+                return task.result()
+            if shutdown.drained():
+                raise Cancelled("shutdown")
+    finally:
+        if not task.done():
+            task.cancel()
+            # Let the cancellation reach the page generator before it is closed
+            await asyncio.wait({task})
+
+
+async def fetch_video(video_id, source, limiter, max_comments, comments, resume_after=None, seen=(), newest=None,
+                      scheduler=None, shutdown=None, fetched=0):
+    """Fetch up to `max_comments` comments into `comments`, taking one token per page.
+
+    With `resume_after` set, comments up to and including that comment ID are
+    skipped, so a video can be picked up where an earlier run stopped. If that
+    comment has been deleted the stream ends without it; the comments passed
+    over are then kept instead (up to `max_comments`, minus seen ones), as if
+    fetching from the top, so the rest of the video is not lost. Comments the
+    earlier run stored come again; compact.py's dedupe drops them by ID.
+
+    `seen` holds top-level comment IDs stored by an earlier run. Comments arrive
+    newest first, so the fetch stops at the first of them; the very first
+    top-level comment may be pinned and is only skipped. Replies to seen
+    comments are skipped too. `newest` collects the first NEWEST_KEPT top-level
+    IDs of a fetch that starts from the top, to be used as `seen` next time.
+
+    A `scheduler` (see scheduler.YieldScheduler) sees every page and can stop
+    the video before `max_comments`; it is asked with the `fetched` comments an
+    earlier, interrupted or partial attempt already stored counted in. Once
+    `shutdown` (a Shutdown) is requested no further page is requested, and
+    Cancelled is raised with `comments` holding what was fetched."""
+    seen = set(seen)
+    from_top = resume_after is None
+    top_level = 0
+    stopped = ended = False
+    passed = []  # Passed over looking for resume_after, kept if it never turns up
+    pages = source.pages(video_id)
+    try:
+        while len(comments) < max_comments and not stopped and (
+                scheduler is None or scheduler.wants(video_id, fetched + len(comments))):
+            if shutdown is not None and shutdown.requested:
+                raise Cancelled("shutdown")
+            await _until_drained(limiter.acquire(), shutdown)
+            if shutdown is not None and shutdown.requested:
+                raise Cancelled("shutdown")
+            start = time.monotonic()
+            try:
+                page = await _until_drained(pages.__anext__(), shutdown)
+            except StopAsyncIteration:
+                await _record_page(limiter, start, OK)
+                ended = True
+                break
+            except Cancelled:
+                raise
+            except ThrottledError:
+                await _record_page(limiter, start, THROTTLED)
+                raise
+            except Exception:
+                await _record_page(limiter, start, ERROR)
+                raise
+            await _record_page(limiter, start, OK)
+            kept = len(comments)
+            for comment in page:
+                cid = comment.get('cid') or ""
+                is_top = bool(cid) and "." not in cid
+                if is_top and from_top and newest is not None and len(newest) < NEWEST_KEPT:
+                    newest.append(cid)
+                if resume_after is not None:
+                    if cid == resume_after:
+                        resume_after = None
+                        passed = []
+                    elif len(passed) < max_comments:
+                        passed.append(comment)
+                elif is_top and cid in seen and top_level:
+                    stopped = True
+                    break
+                elif cid.split(".")[0] not in seen:
+                    comments.append(comment)
+                top_level += is_top
+            if scheduler is not None:
+                scheduler.record(video_id, comments[kept:])
+        if ended and resume_after is not None:
+            METRICS.inc("resume_anchor_missing_total")
+            comments.extend(comment for comment in passed if (comment.get('cid') or "").split(".")[0] not in seen)
+            if newest is not None:
+                newest[:] = [comment['cid'] for comment in passed if "." not in (comment.get('cid') or ".")][:NEWEST_KEPT]
+    finally:
+        await pages.aclose()
+    del comments[max_comments:]
+
+
+async def fetch_videos(video_ids, on_video, source, limiter, max_comments, max_in_flight=MAX_IN_FLIGHT,
+                       desc=None, resume=None, scheduler=None, shutdown=None):
+    """Fetch many videos concurrently, calling on_video(video_id, comments, error, newest) as each finishes.
+
+    on_video may be a coroutine function; it is awaited, so a slow consumer holds back the fetch loop.
+
+    `resume` maps video IDs to (last_cid, comments already fetched, seen comment
+    IDs); `error` is None for a complete fetch, else the exception that stopped
+    it partway. `newest` is the video's newest top-level comment IDs (see fetch_video).
+    With a `scheduler`, max_comments is each video's budget and the scheduler
+    decides how much of it, or of what other videos left, is used.
+
+    After a `shutdown` is requested, every video not finished by the end of
+    its grace, including those not started yet, is reported with a Cancelled
+    error, so on_video still sees each one."""
+    slots = asyncio.Semaphore(max_in_flight)
+    resume = resume or {}
+
+    async def run(video_id):
+        last_cid, fetched, seen = resume.get(video_id, (None, 0, ()))
+        comments, newest = [], []
+        async with slots, limiter.slot():
+            start = time.monotonic()
+            try:
+                limit = scheduler.limit if scheduler is not None else max_comments
+                await fetch_video(video_id, source, limiter, limit - fetched, comments, last_cid, seen, newest,
+                                  scheduler, shutdown, fetched)
+                error = None
+                if scheduler is not None:
+                    scheduler.finish(video_id, fetched + len(comments))
+            except Cancelled as e:
+                error = e
+            except Exception as e:
+                print(f"⚠️ Failed {video_id}: {str(e)}")
+                error = e
+            METRICS.observe("video_fetch_seconds", time.monotonic() - start)
+            outcome = OK if error is None else "cancelled" if isinstance(error, Cancelled) else ERROR
+            METRICS.inc("videos_fetched_total", outcome=outcome)
+            METRICS.inc("comments_fetched_total", len(comments))
+        return video_id, comments, error, newest
+
+    tasks = [asyncio.ensure_future(run(vid)) for vid in video_ids]
+    for task in tqdm(asyncio.as_completed(tasks), total=len(tasks), desc=desc):
+        result = on_video(*await task)
+        if asyncio.iscoroutine(result):
+            await result
+
+
+def fetch_batch(video_ids, on_video, max_comments, source=None, rate=REQUESTS_PER_SECOND,
+                burst=REQUEST_BURST, max_in_flight=MAX_IN_FLIGHT, desc=None, resume=None, limiter=None, scheduler=None,
+                shutdown=None):
+    """Blocking fetch of one batch; pass a long-lived `limiter` to carry its rate across batches"""
+    own_source = source is None
+    if own_source:
+        source = DownloaderSource(max_threads=max_in_flight)
+
+    limiter = limiter or TokenBucket(rate, burst)
+
+    async def main():
+        await fetch_videos(video_ids, on_video, source, limiter, max_comments, max_in_flight, desc, resume, scheduler,
+                           shutdown)
+
+    try:
+        asyncio.run(main())
+    finally:
+        if own_source:
+            source.close()
@@ -0,0 +1,175 @@
+"""Counters, gauges and histograms for long scraping runs
+
+The fetch engine, the pipeline and the scraping scripts record into the shared
+METRICS registry. MetricsExporter appends a snapshot to metrics.jsonl and
+rewrites metrics.prom (Prometheus text format, e.g. for node_exporter's
+textfile collector) every EXPORT_INTERVAL seconds, so a long run shows where
+its time goes: waiting on the network, sleeping in the rate limiter or on
+retries, classifying or writing.
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+# Configuration
+METRICS_LOG_FILE = "metrics.jsonl"
+PROMETHEUS_FILE = "metrics.prom"
+EXPORT_INTERVAL = 30  # Seconds between exports
+PREFIX = "scraper_"
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _series(name, labels, extra=()):
+    labels = list(labels) + list(extra)
+    if not labels:
+        return PREFIX + name
+    return PREFIX + name + "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+class Metrics:
+    """Thread-safe registry; the writer thread and the event loop record into the same one"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.started = time.time()
+
+    def inc(self, name, value=1, **labels):
+        """Add to a counter"""
+        key = _key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        """Set a gauge"""
+        with self.lock:
+            self.gauges[_key(name, labels)] = value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        """Add a value to a histogram"""
+        key = _key(name, labels)
+        with self.lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = {"buckets": buckets, "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(hist["buckets"]):
+                if value <= bound:
+                    hist["counts"][i] += 1
+                    break
+            hist["sum"] += value
+            hist["count"] += 1
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        """Observe how long the block takes, in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+            self.started = time.time()
+
+    def snapshot(self):
+        """Current values as a JSON-friendly dict"""
+        def flat(name, labels):
+            return name + "".join(f"|{k}={v}" for k, v in labels)
+
+        with self.lock:
+            return {
+                "time": datetime.now().isoformat(),
+                "uptime": round(time.time() - self.started, 1),
+                "counters": {flat(*key): value for key, value in sorted(self.counters.items())},
+                "gauges": {flat(*key): value for key, value in sorted(self.gauges.items())},
+                "histograms": {flat(*key): {"count": h["count"], "sum": round(h["sum"], 4),
+                                            "buckets": dict(zip(map(str, h["buckets"]), h["counts"]))}
+                               for key, h in sorted(self.histograms.items())},
+            }
+
+    def prometheus(self):
+        """Current values in the Prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            for kind, series in (("counter", self.counters), ("gauge", self.gauges)):
+                for name in sorted({name for name, _ in series}):
+                    lines.append(f"# TYPE {PREFIX}{name} {kind}")
+                    lines += [f"{_series(name, labels)} {value}" for (n, labels), value in sorted(series.items())
+                              if n == name]
+            for name in sorted({name for name, _ in self.histograms}):
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                for (n, labels), h in sorted(self.histograms.items()):
+                    if n != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(h["buckets"], h["counts"]):
+                        cumulative += count
+                        lines.append(f"{_series(name + '_bucket', labels, [('le', bound)])} {cumulative}")
+                    lines.append(f"{_series(name + '_bucket', labels, [('le', '+Inf')])} {h['count']}")
+                    lines.append(f"{_series(name + '_sum', labels)} {h['sum']}")
+                    lines.append(f"{_series(name + '_count', labels)} {h['count']}")
+            lines.append(f"# TYPE {PREFIX}start_time_seconds gauge")
+            lines.append(f"{PREFIX}start_time_seconds {self.started}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+
+class MetricsExporter:
+    """Background thread exporting `metrics` every `interval` seconds, and once more on stop()"""
+
+    def __init__(self, metrics=METRICS, log_file=METRICS_LOG_FILE, prom_file=PROMETHEUS_FILE, interval=EXPORT_INTERVAL):
+        self.metrics = metrics
+        self.log_file = log_file
+        self.prom_file = prom_file
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def export(self):
+        if self.log_file:
+            with open(self.log_file, "a") as f:
+                f.write(json.dumps(self.metrics.snapshot()) + "\n")
+        if self.prom_file:
+            # Written under a temporary name so the collector never reads half a file
+            with open(self.prom_file + ".tmp", "w") as f:
+                f.write(self.metrics.prometheus())
+            os.replace(self.prom_file + ".tmp", self.prom_file)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.export()
+            except OSError as e:
+                print(f"⚠️ Metrics export failed: {str(e)}")
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.export()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
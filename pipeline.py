@@ -0,0 +1,180 @@
+import asyncio
+import os
+import signal
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from fetcher import (DownloaderSource, TokenBucket, fetch_videos,
+                     REQUESTS_PER_SECOND, REQUEST_BURST, MAX_IN_FLIGHT)
+from metrics import METRICS
+
+# Configuration
+FETCHED_QUEUE_SIZE = 200     # Fetched videos waiting for classification
+CLASSIFIED_QUEUE_SIZE = 200  # Classified videos waiting for the writer
+CHUNK_COMMENTS = 5000        # Comments handed to a classifier process at once
+CLASSIFY_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+
+class StageStats:
+    """Throughput counters for one pipeline stage"""
+
+    def __init__(self, name):
+        self.name = name
+        self.videos = 0
+        self.comments = 0
+        self.busy = 0.0
+        self.max_queue = 0
+        self.started = time.monotonic()
+
+    def add(self, videos, comments, seconds=0.0, queue=None):
+        self.videos += videos
+        self.comments += comments
+        self.busy += seconds
+        if queue is not None:
+            self.max_queue = max(self.max_queue, queue.qsize())
+
+    def __str__(self):
+        wall = max(time.monotonic() - self.started, 1e-9)
+        busy = f" | busy {self.busy / wall:.0%}" if self.busy else ""
+        queue = f" | queue peak {self.max_queue}" if self.max_queue else ""
+        return f"{self.name:<9} {self.videos:>5} videos {self.comments:>8} comments {self.comments / wall:>9.0f}/s{busy}{queue}"
+
+
+class PipelineStats:
+    """Per-stage counters; the stage that is busy close to 100% of the time is the bottleneck"""
+
+    def __init__(self):
+        self.fetch = StageStats("fetch")
+        self.classify = StageStats("classify")
+        self.write = StageStats("write")
+
+    def __str__(self):
+        return "\n".join(f"📊 {stage}" for stage in (self.fetch, self.classify, self.write))
+
+
+def ignore_signals():
+    """Process pool initializer: SIGINT / SIGTERM reach the whole process group, but only the
+    parent should act on them; workers are shut down by it once the queues are drained"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+
+def _timed_classify(classify_chunk, chunk):
+    """Runs in the classifier process so busy time excludes pool queueing"""
+    start = time.perf_counter()
+    result = classify_chunk(chunk)
+    return result, time.perf_counter() - start
+
+
+async def run_pipeline(video_ids, classify_chunk, write_video, source, limiter, max_comments,
+                       max_in_flight=MAX_IN_FLIGHT, desc=None, resume=None, pool=None, workers=CLASSIFY_WORKERS,
+                       scheduler=None, shutdown=None):
+    """Fetch -> classify -> write with bounded queues between the stages.
+
+    classify_chunk([(video_id, texts), ...]) runs in `pool` (a process pool; the
+    default thread pool if None) and returns [(video_id, types), ...] with one type
+    per text, None for texts to drop. write_video(video_id, comments, types,
+    fetched, last_cid, error, newest) gets the raw comment dicts and runs on a
+    single writer thread. Full queues block the stage before them, so memory stays bounded.
+
+    After a `shutdown` (fetcher.Shutdown) is requested, the fetch stage winds
+    down within its grace and everything it handed on is still classified and
+    written, each cut-short video with a fetcher.Cancelled error."""
+    loop = asyncio.get_running_loop()
+    fetched = asyncio.Queue(FETCHED_QUEUE_SIZE)
+    classified = asyncio.Queue(CLASSIFIED_QUEUE_SIZE)
+    stats = PipelineStats()
+    write_thread = ThreadPoolExecutor(max_workers=1)
+
+    async def on_video(video_id, comments, error, newest):
+        texts = [comment['text'].strip() for comment in comments]
+        meta = (comments, len(comments), comments[-1].get('cid') if comments else None, error, newest)
+        await fetched.put((video_id, texts, meta))
+        stats.fetch.add(1, len(comments), queue=fetched)
+        METRICS.set("queue_depth", fetched.qsize(), queue="fetched")
+
+    async def classify_one(chunk, slots):
+        try:
+            results, seconds = await loop.run_in_executor(
+                pool, _timed_classify, classify_chunk, [(vid, texts) for vid, texts, _ in chunk])
+            stats.classify.add(len(chunk), sum(len(texts) for _, texts, _ in chunk), seconds)
+            METRICS.observe("classify_seconds", seconds)
+            for (video_id, types), (_, _, (comments, *meta)) in zip(results, chunk):
+                await classified.put((video_id, comments, types, *meta))
+                stats.classify.add(0, 0, queue=classified)
+                METRICS.set("queue_depth", classified.qsize(), queue="classified")
+        finally:
+            slots.release()
+
+    async def classifier():
+        # At most two chunks per worker in flight; beyond that the fetched queue fills up
+        slots = asyncio.Semaphore(2 * workers)
+        tasks = []
+        finished = False
+        while not finished:
+            chunk, size = [], 0
+            item = await fetched.get()
+            while item is not None:
+                chunk.append(item)
+                size += len(item[1])
+                if size >= CHUNK_COMMENTS or fetched.empty():
+                    break
+                item = fetched.get_nowait()
+            finished = item is None
+            if chunk:
+                await slots.acquire()
+                tasks.append(asyncio.ensure_future(classify_one(chunk, slots)))
+        await asyncio.gather(*tasks)
+        await classified.put(None)
+
+    async def writer():
+        while True:
+            item = await classified.get()
+            if item is None:
+                return
+            start = time.perf_counter()
+            await loop.run_in_executor(write_thread, write_video, *item)
+            stats.write.add(1, len(item[1]), time.perf_counter() - start)
+            METRICS.observe("write_seconds", time.perf_counter() - start)
+            METRICS.set("queue_depth", classified.qsize(), queue="classified")
+            for type_name, count in Counter(item[2]).items():
+                if type_name is not None:
+                    METRICS.inc("comments_total", count, type=type_name)
+
+    async def fetcher():
+        try:
+            await fetch_videos(video_ids, on_video, source, limiter, max_comments, max_in_flight, desc, resume,
+                               scheduler, shutdown)
+        finally:
+            await fetched.put(None)
+
+    try:
+        await asyncio.gather(fetcher(), classifier(), writer())
+    finally:
+        write_thread.shutdown(wait=True)
+    return stats
+
+
+def run_batch(video_ids, classify_chunk, write_video, max_comments, source=None, rate=REQUESTS_PER_SECOND,
+              burst=REQUEST_BURST, max_in_flight=MAX_IN_FLIGHT, desc=None, resume=None, pool=None,
+              workers=CLASSIFY_WORKERS, limiter=None, scheduler=None, shutdown=None):
+    """Blocking entry point used by the scraping scripts' process_batch; returns PipelineStats.
+
+    Pass a long-lived `limiter` (e.g. an AdaptiveLimiter) to carry its rate across batches,
+    a `scheduler` (scheduler.YieldScheduler) to share the comment budget by yield, and a
+    `shutdown` (fetcher.Shutdown) to stop the batch early without losing what was fetched."""
+    own_source = source is None
+    if own_source:
+        source = DownloaderSource(max_threads=max_in_flight)
+
+    limiter = limiter or TokenBucket(rate, burst)
+
+    async def main():
+        return await run_pipeline(video_ids, classify_chunk, write_video, source, limiter, max_comments,
+                                  max_in_flight, desc, resume, pool, workers, scheduler, shutdown)
+
+    try:
+        return asyncio.run(main())
+    finally:
+        if own_source:
+            source.close()
@@ -1,69 +1,47 @@
-from youtube_comment_downloader import YoutubeCommentDownloader
-import pandas as pd
-import time
-import random
+import argparse
 import os
-from tqdm import tqdm
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
 from datetime import datetime, timedelta
-import json
+from concurrent.futures import ProcessPoolExecutor
+from pipeline import run_batch, ignore_signals, CLASSIFY_WORKERS
+from fetcher import AdaptiveLimiter, DownloaderSource, Cancelled, Shutdown
+from writer import StreamingParquetWriter, BATCH_SCHEMA, comment_table
+from compact import combine_results
+from dedupe import LEVELS
+from archive import RawArchive, ARCHIVE_DIR
+from metrics import METRICS, MetricsExporter
+from state import StateStore, DONE, PARTIAL, FAILED
+from classify import classify_batch, load_keywords, TANGLISH_KEYWORDS_FILE
 
 # Configuration
 VIDEO_IDS_FILE = "all_video_ids.txt"
 OUTPUT_DIR = "comment_data"
 MAX_COMMENTS_PER_VIDEO = 500
-MAX_WORKERS = 3
-REQUEST_DELAY = (1, 3)  # Random delay between requests (min, max) in seconds
+REQUESTS_PER_SECOND = 2.0  # Starting page-request rate; the adaptive limiter tunes it from there
+REQUEST_BURST = 5
+MAX_IN_FLIGHT = 200  # Upper bound on videos fetched concurrently
 MAX_RUNTIME = timedelta(hours=20)
-SAVE_INTERVAL = timedelta(minutes=30)
-
-# Tanglish keywords
-TANGLISH_KEYWORDS = {
-    'super', 'thanks', 'anna', 'video', 'bro', 'sir', 'hi', 'hello',
-    'nalla', 'thala', 'varuma', 'romba', 'semma', 'epdi', 'keep it up'
-}
-
-def safe_to_parquet(df, path):
-    """Handle Parquet export with fallback to CSV"""
-    try:
-        df.to_parquet(path, engine='pyarrow', compression='gzip')
-    except Exception as e:
-        print(f"⚠️ Parquet failed ({str(e)}), falling back to CSV")
-        df.to_csv(path.replace('.parquet', '.csv'), index=False)
+SAVE_INTERVAL = timedelta(minutes=30)  # Longest a batch file stays open before it is closed and a new part started
+STATE_FILE = "progress.db"  # Per-video state (SQLite); replaces progress.json
+BATCH_SIZE = 100
+FAILED_IDS_FILE = "failed_ids.txt"  # Videos that failed every retry
+DEDUPE = "id"  # Duplicates the end-of-run combine drops: "id", "exact" or "near" (see dedupe.py); None keeps all
+
+# Tanglish keywords (one compiled matcher, see tanglish_keywords.txt)
+TANGLISH_KEYWORDS = load_keywords(TANGLISH_KEYWORDS_FILE)
 
 def load_video_ids():
     """Load video IDs from file"""
     with open(VIDEO_IDS_FILE) as f:
         return [line.strip() for line in f if len(line.strip()) == 11]
 
-def load_progress():
-    """Load progress from JSON file if it exists"""
-    if os.path.exists("progress.json"):
-        try:
-            with open("progress.json", "r") as f:
-                return json.load(f)
-        except:
-            return {"processed_ids": [], "current_batch": 0}
-    return {"processed_ids": [], "current_batch": 0}
-
-def save_progress(processed_ids, current_batch):
-    """Save progress to JSON file"""
-    progress = {
-        "processed_ids": list(processed_ids),
-        "current_batch": current_batch,
-        "last_saved": datetime.now().isoformat()
-    }
-    with open("progress.json", "w") as f:
-        json.dump(progress, f)
-
 def is_pure_tamil(text):
     """Check if text contains only Tamil characters"""
     return all(0x0B80 <= ord(c) <= 0x0BFF or c.isspace() or c in ',.!?;:' for c in text)
 
 def is_tanglish(text):
     """Check if text matches Tanglish patterns"""
-    text_lower = text.lower()
-    return (any(kw in text_lower for kw in TANGLISH_KEYWORDS) and 
+    return (TANGLISH_KEYWORDS.search(text) and 
            not any(0x0B80 <= ord(c) <= 0x0BFF for c in text))
 
 def classify_comment(text):
@@ -76,117 +54,118 @@ def classify_comment(text):
         return "tanglish"
     return "code_mixed"
 
-def scrape_comments(video_id):
-    """Scrape comments for a single video"""
-    downloader = YoutubeCommentDownloader()
-    comments = []
-    
-    try:
-        for i, comment in enumerate(downloader.get_comments(video_id)):
-            if i >= MAX_COMMENTS_PER_VIDEO:
-                break
-                
-            comments.append({
-                "video_id": video_id,
-                "text": comment['text'].strip(),
-                "type": classify_comment(comment['text'].strip()),
-                "timestamp": datetime.now().isoformat()
-            })
-            
-            if i % random.randint(5, 15) == 0:
-                time.sleep(random.uniform(*REQUEST_DELAY))
-                
-        return video_id, comments
-    except Exception as e:
-        print(f"⚠️ Failed {video_id}: {str(e)}")
-        return video_id, []
-
-def process_batch(batch_ids, batch_num):
-    """Process a batch of video IDs"""
-    batch_results = []
-    
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {executor.submit(scrape_comments, vid): vid for vid in batch_ids}
-        
-        for future in tqdm(as_completed(futures), total=len(futures), desc=f"Batch {batch_num}"):
-            video_id, comments = future.result()
-            batch_results.extend(comments)
-    
-    if batch_results:
-        os.makedirs(OUTPUT_DIR, exist_ok=True)
-        batch_file = os.path.join(OUTPUT_DIR, f"batch_{batch_num}_{datetime.now().strftime('%Y%m%d')}.parquet")
-        safe_to_parquet(pd.DataFrame(batch_results), batch_file)
-    
-    return len(batch_results)
-
-def combine_results():
-    """Combine all batch files into final datasets"""
-    all_data = []
-    for file in os.listdir(OUTPUT_DIR):
-        if not (file.endswith(".parquet") or file.endswith(".csv")):
-            continue
-            
-        try:
-            file_path = os.path.join(OUTPUT_DIR, file)
-            df = pd.read_parquet(file_path) if file.endswith(".parquet") else pd.read_csv(file_path)
-            all_data.append(df)
-        except Exception as e:
-            print(f"⚠️ Error reading {file}: {str(e)}")
-    
-    if all_data:
-        final_df = pd.concat(all_data, ignore_index=True)
-        
-        # Save by comment type
-        for type_name in ["pure_tamil", "code_mixed", "tanglish"]:
-            subset = final_df[final_df['type'] == type_name]
-            if not subset.empty:
-                safe_to_parquet(subset, f"{type_name}_comments.parquet")
-        
-        # Save full dataset
-        safe_to_parquet(final_df, "all_comments.parquet")
-        print("\n✅ Final counts:")
-        print(final_df['type'].value_counts())
+def classify_chunk(chunk):
+    """Classify [(video_id, texts), ...] in one vectorised pass (runs in a worker process)"""
+    types = iter(classify_batch([text for _, texts in chunk for text in texts], TANGLISH_KEYWORDS))
+    return [(video_id, [next(types) for _ in texts]) for video_id, texts in chunk]
+
+def process_batch(batch_ids, batch_num, state, pool=None, limiter=None, source=None, shutdown=None, archive=None):
+    """Process a batch of video IDs: fetch, classify in worker processes, stream to Parquet"""
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    batch_file = os.path.join(OUTPUT_DIR, f"batch_{batch_num}_{datetime.now().strftime('%Y%m%d')}.parquet")
+    resume = state.resume_points(batch_ids)
+    state.start(batch_ids)
+
+    with StreamingParquetWriter(batch_file, save_interval=SAVE_INTERVAL, schema=BATCH_SCHEMA) as writer:
+        def write_video(video_id, comments, types, fetched, last_cid, error, newest):
+            status = DONE if error is None else PARTIAL if fetched else FAILED
+            # State only moves forward once the rows are in a closed file
+            if archive is not None:
+                archive.add(video_id, comments)
+            if isinstance(error, Cancelled):
+                # Cut short by a shutdown: resumes from last_cid next run
+                commit = lambda: state.checkpoint(video_id, fetched, last_cid, newest)
+            else:
+                commit = lambda: state.finish(video_id, status, fetched, last_cid, error and str(error), newest)
+            writer.write(comment_table(video_id, comments, types, datetime.now()), commit=commit)
+
+        stats = run_batch(batch_ids, classify_chunk, write_video, MAX_COMMENTS_PER_VIDEO, rate=REQUESTS_PER_SECOND,
+                          burst=REQUEST_BURST, max_in_flight=MAX_IN_FLIGHT, desc=f"Batch {batch_num}",
+                          resume=resume, pool=pool, limiter=limiter, source=source, shutdown=shutdown)
+
+    print(stats)
+    return writer.count
 
 def main():
     """Main scraping workflow with resume support"""
+    parser = argparse.ArgumentParser(description="Scrape and classify comments for the IDs in " + VIDEO_IDS_FILE)
+    parser.add_argument("--since-last-run", action="store_true",
+                        help="re-scrape finished videos, fetching only comments newer than the last run")
+    parser.add_argument("--archive", action="store_true",
+                        help=f"also keep every fetched comment as-is in {ARCHIVE_DIR}/ (see archive.py)")
+    parser.add_argument("--dedupe", choices=LEVELS, default=DEDUPE,
+                        help=f"duplicates the final combine drops (default: {DEDUPE}, see dedupe.py)")
+    args = parser.parse_args()
+
     start_time = datetime.now()
     video_ids = load_video_ids()
-    progress = load_progress()
-    
-    # Filter already processed IDs
-    processed_ids = set(progress.get("processed_ids", []))
-    remaining_ids = [vid for vid in video_ids if vid not in processed_ids]
-    
-    print(f"⏳ Resuming from {len(processed_ids)} processed videos | {len(remaining_ids)} remaining")
-    total_batches = (len(remaining_ids) // 100) + 1
-    current_batch = progress.get("current_batch", 0)
-
-    for batch_num in range(current_batch, total_batches):
-        batch_start = batch_num * 100
-        batch_ids = remaining_ids[batch_start : batch_start + 100]
-
-        print(f"\n📦 Processing batch {batch_num + 1}/{total_batches} ({(batch_num + 1)/total_batches:.1%})")
-        batch_count = process_batch(batch_ids, batch_num + 1)
-        
-        # Update progress
-        processed_ids.update(batch_ids)
-        save_progress(processed_ids, batch_num + 1)
-        
-        print(f"✔️ Batch {batch_num + 1} complete | {batch_count} comments")
+    state = StateStore(STATE_FILE)
+    state.import_legacy("progress.json")
+    state.add(video_ids)
+    if args.since_last_run:
+        print(f"🔁 Checking {state.rescan()} finished videos for new comments")
+
+    remaining_ids = state.remaining()
+    print(f"⏳ Resuming from {len(video_ids) - len(remaining_ids)} processed videos | {len(remaining_ids)} remaining")
+    # Raw comments as fetched, so the classification can be redone offline (archive.py reclassify)
+    archive = RawArchive() if args.archive else None
+
+    # Classification runs in worker processes so it never competes with fetching for the GIL
+    pool = ProcessPoolExecutor(max_workers=CLASSIFY_WORKERS, initializer=ignore_signals)
+    # Rate and concurrency adapt to how the server responds (see rate_log.jsonl)
+    limiter = AdaptiveLimiter(REQUESTS_PER_SECOND, REQUEST_BURST, max_concurrency=MAX_IN_FLIGHT)
+    # Downloader sessions (connections, consent cookies) are reused across videos and batches
+    source = DownloaderSource(max_threads=MAX_IN_FLIGHT)
+    # Per-stage metrics go to metrics.jsonl and metrics.prom while the run is going
+    exporter = MetricsExporter().start()
+    # Ctrl-C, SIGTERM and MAX_RUNTIME stop the run within a few seconds; nothing fetched so far is lost
+    shutdown = Shutdown(deadline=start_time.timestamp() + MAX_RUNTIME.total_seconds()).install()
+
+    # Failed and partial videos come back through next_batch() once their backoff expires
+    batch_index = 0
+    while not shutdown.requested:
+        batch_ids = state.next_batch(BATCH_SIZE)
+        if not batch_ids:
+            due = state.next_retry_time()
+            if due is None:
+                break
+            wait = max(0.0, due - time.time())
+            if datetime.now() - start_time + timedelta(seconds=wait) > MAX_RUNTIME:
+                print("⏰ Max runtime reached before the remaining retries are due")
+                break
+            print(f"⏳ Only retries left, next one in {wait:.0f}s")
+            METRICS.inc("retry_wait_seconds_total", wait)
+            shutdown.sleep(wait)
+            continue
+
+        batch_index += 1
+        batch_num = state.next_batch_number(OUTPUT_DIR)
+        counts = state.counts()
+        print(f"\n📦 Processing batch {batch_index} ({counts.get(DONE, 0)/len(video_ids):.1%} of videos done)")
+        batch_count = process_batch(batch_ids, batch_num, state, pool, limiter, source, shutdown, archive)
         
-        # Runtime check
-        elapsed = datetime.now() - start_time
-        if elapsed > MAX_RUNTIME:
-            print(f"⏰ Max runtime reached ({elapsed})")
-            break
-
-    # Final cleanup
-    if len(processed_ids) == len(video_ids):
-        os.remove("progress.json")  # Only delete if fully completed
-        print("♻️ Progress file cleaned up (fully completed)")
-    
-    combine_results()
+        counts = state.counts()
+        for status, count in counts.items():
+            METRICS.set("videos", count, status=status)
+        print(f"✔️ Batch {batch_num} complete | {batch_count} comments | {counts}")
+
+    pool.shutdown()
+    source.close()
+    print(source.sessions)
+    exporter.stop()
+    if archive is not None:
+        archive.close()
+    state.report_failures(FAILED_IDS_FILE)
+
+    # The state store is kept after a complete run: --since-last-run starts from it
+    state.close()
+    if shutdown.signum is None:
+        combine_results(dedupe=args.dedupe)
+    else:
+        print("🧩 Stopped early; run `python compact.py` to combine the batch files")
     print(f"\n🏁 Total runtime: {datetime.now() - start_time}")
+    shutdown.restore()
+    shutdown.exit()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,113 @@
+"""Spend the page-request budget where the Tamil comments are
+
+Most videos in all_video_ids.txt have few Tamil comments, yet every one used
+to be fetched up to its full budget and filtered afterwards. YieldScheduler
+follows each video's share of useful comments page by page (e.g. comments
+with Tamil script), blended with its channel's share so far:
+
+- a video whose estimated yield falls below YIELD_THRESHOLD stops early,
+- the comments a video leaves unused go into a spare pool, from which
+  videos yielding above HIGH_YIELD may fetch past their budget (up to
+  MAX_BOOST times it),
+- rank() orders pending videos so high-yield channels are scraped first.
+
+Channels come from channels.py's video index; videos without one share the
+run's overall yield.
+"""
+from metrics import METRICS
+
+# Configuration
+YIELD_THRESHOLD = 0.1  # Estimated useful share below which a video is stopped
+HIGH_YIELD = 0.5       # Estimated useful share above which a video may use spare budget
+MIN_SAMPLE = 20        # Comments a video fetches before it can be stopped (one page)
+PRIOR_WEIGHT = 40      # Comments' worth of weight the channel's yield carries in a video's estimate
+DEFAULT_YIELD = 0.2    # Assumed yield before anything is known
+MAX_BOOST = 3          # A video never fetches more than this many times its budget
+
+
+class YieldScheduler:
+    """Per-video and per-channel useful-comment yield, deciding how far each video is fetched.
+
+    `useful(texts)` counts the useful comments in a list of texts. `channels`
+    maps video IDs to channels and `history` holds (video_id, comments,
+    useful) from earlier runs. All methods are called from the event loop."""
+
+    def __init__(self, budget, useful, channels=None, history=(), threshold=YIELD_THRESHOLD,
+                 high_yield=HIGH_YIELD, max_boost=MAX_BOOST):
+        self.budget = budget
+        self.limit = budget * max_boost
+        self.useful = useful
+        self.channels = channels or {}
+        self.threshold = threshold
+        self.high_yield = high_yield
+        self.videos = {}           # video_id -> [comments, useful] this run
+        self.channel_totals = {}   # channel -> [comments, useful], earlier runs included
+        self.total = [0, 0]
+        self.spare = 0
+        self.stopped = set()
+        self.boosted = set()
+        for video_id, comments, useful_count in history:
+            self._add(self.channels.get(video_id), comments, useful_count)
+
+    def _add(self, channel, comments, useful):
+        if channel is not None:
+            totals = self.channel_totals.setdefault(channel, [0, 0])
+            totals[0] += comments
+            totals[1] += useful
+        self.total[0] += comments
+        self.total[1] += useful
+
+    def prior(self, video_id):
+        """Expected yield of a video before its own comments count: its channel's, else the run's"""
+        for comments, useful in (self.channel_totals.get(self.channels.get(video_id), (0, 0)), self.total):
+            if comments >= PRIOR_WEIGHT:
+                return useful / comments
+        return DEFAULT_YIELD
+
+    def estimate(self, video_id):
+        """Yield of a video so far, pulled towards its prior while it has few comments"""
+        comments, useful = self.videos.get(video_id, (0, 0))
+        return (useful + PRIOR_WEIGHT * self.prior(video_id)) / (comments + PRIOR_WEIGHT)
+
+    def rank(self, video_id):
+        """Sort key for pending videos: best expected yield first"""
+        return -self.prior(video_id)
+
+    def wants(self, video_id, fetched):
+        """Whether a video that has `fetched` comments so far should get another page"""
+        comments = self.videos.get(video_id, (0, 0))[0]
+        if comments >= MIN_SAMPLE and self.estimate(video_id) < self.threshold:
+            if video_id not in self.stopped:
+                self.stopped.add(video_id)
+                METRICS.inc("videos_stopped_total", reason="low_yield")
+            return False
+        if fetched < self.budget:
+            return True
+        if fetched < self.limit and self.spare > 0 and self.estimate(video_id) >= self.high_yield:
+            self.boosted.add(video_id)
+            return True
+        return False
+
+    def record(self, video_id, comments):
+        """Count a page of a video's comments"""
+        useful = int(self.useful([comment['text'] for comment in comments])) if comments else 0
+        counts = self.videos.setdefault(video_id, [0, 0])
+        over = max(0, counts[0] - self.budget)
+        counts[0] += len(comments)
+        counts[1] += useful
+        # Comments past the budget come out of the spare pool
+        self.spare -= max(0, counts[0] - self.budget) - over
+        self._add(self.channels.get(video_id), len(comments), useful)
+        METRICS.inc("comments_useful_total", useful)
+        METRICS.set("yield_spare_comments", self.spare)
+
+    def finish(self, video_id, fetched):
+        """A video is done; the part of its budget it did not use becomes spare"""
+        self.spare += max(0, self.budget - fetched)
+        METRICS.set("yield_spare_comments", self.spare)
+
+    def __str__(self):
+        comments = sum(counts[0] for counts in self.videos.values())
+        useful = sum(counts[1] for counts in self.videos.values())
+        return (f"🎯 Yield {useful / max(comments, 1):.0%} ({useful:,}/{comments:,}) | {len(self.stopped)} videos "
+                f"stopped early, {len(self.boosted)} given extra budget, {max(self.spare, 0):,} comments spare")
@@ -1,156 +1,202 @@
-from youtube_comment_downloader import YoutubeCommentDownloader
-import pandas as pd
+import argparse
 import time
-import random
 import os
-from tqdm import tqdm
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from pipeline import run_batch, ignore_signals, CLASSIFY_WORKERS
+from fetcher import AdaptiveLimiter, DownloaderSource, Cancelled, Shutdown
+from writer import StreamingParquetWriter, BATCH_SCHEMA, comment_table
+from compact import combine_results
+from dedupe import LEVELS
+from archive import RawArchive, ARCHIVE_DIR
+from metrics import METRICS, MetricsExporter
+from state import StateStore, DONE, PARTIAL, FAILED
+from scheduler import YieldScheduler
+from channels import VideoIndex, INDEX_FILE
+from work import WorkQueue
+from classify import classify_batch, load_keywords, TANGLISH_KEYWORDS_FILE, has_tamil_batch
 
 # Configuration
 VIDEO_IDS_FILE = "all_video_ids.txt"
 OUTPUT_DIR = "comment_data"
 MAX_COMMENTS_PER_VIDEO = 500
-MAX_WORKERS = 3
-REQUEST_DELAY = (1, 3)
+REQUESTS_PER_SECOND = 2.0  # Starting page-request rate; the adaptive limiter tunes it from there
+REQUEST_BURST = 5
+MAX_IN_FLIGHT = 200  # Upper bound on videos fetched concurrently
 MAX_RUNTIME = timedelta(hours=20)
-SAVE_INTERVAL = timedelta(minutes=30)
+SAVE_INTERVAL = timedelta(minutes=30)  # Longest a batch file stays open before it is closed and a new part started
+STATE_FILE = "processed.db"  # Per-video state (SQLite); replaces processed.log
+BATCH_SIZE = 100
+FAILED_IDS_FILE = "failed_ids.txt"  # Videos that failed every retry
+DEDUPE = "id"  # Duplicates the end-of-run combine drops: "id", "exact" or "near" (see dedupe.py); None keeps all
 
-# Tanglish keywords
-TANGLISH_KEYWORDS = {
-    'super', 'thanks', 'anna', 'video', 'bro', 'sir', 'hi', 'hello',
-    'nalla', 'thala', 'varuma', 'romba', 'semma', 'epdi', 'keep it up'
-}
-
-def safe_to_parquet(df, path):
-    """Handle Parquet export with fallback to CSV"""
-    try:
-        df.to_parquet(path, engine='pyarrow', compression='gzip')
-    except ImportError:
-        print("PyArrow not available, falling back to CSV")
-        df.to_csv(path.replace('.parquet', '.csv'), index=False)
+# Tanglish keywords (one compiled matcher, see tanglish_keywords.txt)
+TANGLISH_KEYWORDS = load_keywords(TANGLISH_KEYWORDS_FILE)
 
 def load_video_ids():
     with open(VIDEO_IDS_FILE) as f:
         return [line.strip() for line in f if len(line.strip()) == 11]
 
-def is_pure_tamil(text):
-    return all(0x0B80 <= ord(c) <= 0x0BFF or c.isspace() or c in ',.!?;:' for c in text)
-
-def is_tanglish(text):
-    text_lower = text.lower()
-    return (any(kw in text_lower for kw in TANGLISH_KEYWORDS) and \
-           not any(0x0B80 <= ord(c) <= 0x0BFF for c in text))
+def classify_chunk(chunk):
+    """Classify Tamil comments (None drops the rest), for [(video_id, texts), ...] at once (runs in a worker process)"""
+    texts = [text for _, texts in chunk for text in texts]
+    tamil = has_tamil_batch(texts)
+    types = np.full(len(texts), None, dtype=object)
+    types[tamil] = classify_batch([text for text, keep in zip(texts, tamil) if keep], TANGLISH_KEYWORDS)
+    types = iter(types.tolist())
+    return [(video_id, [next(types) for _ in texts]) for video_id, texts in chunk]
 
-def classify_comment(text):
-    if is_pure_tamil(text):
-        return "pure_tamil"
-    elif is_tanglish(text):
-        return "tanglish"
-    return "code_mixed"
+def count_tamil(texts):
+    """Useful comments for the yield scheduler: the ones classify_chunk keeps"""
+    return has_tamil_batch(texts).sum()
 
-def scrape_comments(video_id):
-    downloader = YoutubeCommentDownloader()
-    comments = []
-    
+def load_channels():
+    """{video_id: channel} from channels.py's index, if it has been run"""
+    if not os.path.exists(INDEX_FILE):
+        return {}
+    index = VideoIndex(INDEX_FILE, ids_file=None)
     try:
-        for i, comment in enumerate(downloader.get_comments(video_id)):
-            if i >= MAX_COMMENTS_PER_VIDEO:
-                break
-            comments.append(comment['text'].strip())
-            
-            if i % random.randint(10, 20) == 0:
-                time.sleep(random.uniform(*REQUEST_DELAY))
-                
-        return video_id, comments
-    except Exception as e:
-        print(f"⚠️ Failed {video_id}: {str(e)}")
-        return video_id, []
+        return index.channels()
+    finally:
+        index.close()
 
-def process_batch(batch_ids, batch_num):
-    batch_results = []
-    
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {executor.submit(scrape_comments, vid): vid for vid in batch_ids}
-        
-        for future in tqdm(as_completed(futures), total=len(futures), desc=f"Batch {batch_num}"):
-            video_id, comments = future.result()
-            
-            for comment in comments:
-                if any(0x0B80 <= ord(c) <= 0x0BFF for c in comment):
-                    batch_results.append({
-                        "video_id": video_id,
-                        "text": comment,
-                        "type": classify_comment(comment)
-                    })
-    
-    if batch_results:
-        os.makedirs(OUTPUT_DIR, exist_ok=True)
-        batch_file = os.path.join(OUTPUT_DIR, f"batch_{batch_num}.parquet")
-        safe_to_parquet(pd.DataFrame(batch_results), batch_file)
-    
-    return len(batch_results)
+def process_batch(batch_ids, batch_num, state, pool=None, limiter=None, source=None, scheduler=None,
+                  output_dir=OUTPUT_DIR, shutdown=None, archive=None):
+    os.makedirs(output_dir, exist_ok=True)
+    batch_file = os.path.join(output_dir, f"batch_{batch_num}.parquet")
+    resume = state.resume_points(batch_ids)
+    state.start(batch_ids)
 
-def combine_results():
-    all_data = []
-    for file in os.listdir(OUTPUT_DIR):
-        file_path = os.path.join(OUTPUT_DIR, file)
-        try:
-            if file.endswith(".parquet"):
-                all_data.append(pd.read_parquet(file_path))
-            elif file.endswith(".csv"):
-                all_data.append(pd.read_csv(file_path))
-        except Exception as e:
-            print(f"⚠️ Error reading {file}: {str(e)}")
-            continue
-    
-    if all_data:
-        final_df = pd.concat(all_data)
-        
-        for type_name in ["pure_tamil", "code_mixed", "tanglish"]:
-            subset = final_df[final_df['type'] == type_name]
-            if not subset.empty:
-                safe_to_parquet(subset, f"{type_name}_comments.parquet")
-        
-        print(f"\n✅ Final counts:")
-        print(final_df['type'].value_counts())
+    with StreamingParquetWriter(batch_file, save_interval=SAVE_INTERVAL, schema=BATCH_SCHEMA) as writer:
+        def write_video(video_id, comments, types, fetched, last_cid, error, newest):
+            status = DONE if error is None else PARTIAL if fetched else FAILED
+            # State only moves forward once the rows are in a closed file
+            useful = sum(type_name is not None for type_name in types)
+            if archive is not None:
+                archive.add(video_id, comments)
+            if isinstance(error, Cancelled):
+                # Cut short by a shutdown: resumes from last_cid next run
+                commit = lambda: state.checkpoint(video_id, fetched, last_cid, newest, useful)
+            else:
+                commit = lambda: state.finish(video_id, status, fetched, last_cid, error and str(error), newest, useful)
+            writer.write(comment_table(video_id, comments, types), commit=commit)
+
+        stats = run_batch(batch_ids, classify_chunk, write_video, MAX_COMMENTS_PER_VIDEO, rate=REQUESTS_PER_SECOND,
+                          burst=REQUEST_BURST, max_in_flight=MAX_IN_FLIGHT, desc=f"Batch {batch_num}",
+                          resume=resume, pool=pool, limiter=limiter, source=source, scheduler=scheduler,
+                          shutdown=shutdown)
+
+    print(stats)
+    return writer.count
 
 def main():
+    parser = argparse.ArgumentParser(description="Scrape Tamil comments for the IDs in " + VIDEO_IDS_FILE)
+    parser.add_argument("--since-last-run", action="store_true",
+                        help="re-scrape finished videos, fetching only comments newer than the last run")
+    parser.add_argument("--work-dir", help="lease chunks of videos from this shared directory (see work.py)")
+    parser.add_argument("--worker", help="worker name with --work-dir, one per process (default: <host>-<pid>); "
+                             "reuse it to resume that worker's shard")
+    parser.add_argument("--archive", action="store_true",
+                        help=f"also keep every fetched comment as-is in {ARCHIVE_DIR}/ (see archive.py)")
+    parser.add_argument("--dedupe", choices=LEVELS, default=DEDUPE,
+                        help=f"duplicates the final combine drops (default: {DEDUPE}, see dedupe.py)")
+    args = parser.parse_args()
+
     start_time = datetime.now()
     video_ids = load_video_ids()
     print(f"Loaded {len(video_ids)} video IDs | Target runtime: {MAX_RUNTIME}")
     
-    processed_ids = set()
-    if os.path.exists("processed.log"):
-        with open("processed.log") as f:
-            processed_ids = {line.strip() for line in f}
+    queue = None
+    output_dir = OUTPUT_DIR
+    if args.work_dir:
+        # Videos come from leased chunks; batch files go to this worker's shard in the work directory,
+        # the SQLite state store stays on local disk
+        queue = WorkQueue(args.work_dir, args.worker)
+        print(f"📋 {queue.plan(video_ids)} new chunks planned in {args.work_dir}")
+        output_dir = queue.shard_dir()
+        os.makedirs(output_dir, exist_ok=True)
+        os.makedirs(queue.state_dir(), exist_ok=True)
+        state = StateStore(os.path.join(queue.state_dir(), STATE_FILE))
+        queue.start()
+    else:
+        state = StateStore(STATE_FILE)
+        state.import_legacy("processed.log")
+        state.add(video_ids)
+    if args.since_last_run:
+        print(f"Checking {state.rescan()} finished videos for new comments")
     
-    remaining_ids = [vid for vid in video_ids if vid not in processed_ids]
-    total_batches = len(remaining_ids) // 100 + 1
+    remaining_ids = state.remaining()
+    print(f"{len(remaining_ids)} videos remaining")
+    # Raw comments, Tamil or not, so the classification can be redone offline (archive.py reclassify)
+    archive = RawArchive(os.path.join(queue.state_dir(), ARCHIVE_DIR) if queue is not None else ARCHIVE_DIR) \
+        if args.archive else None
     
-    for batch_num, i in enumerate(range(0, len(remaining_ids), 100)):
-        if datetime.now() - start_time > MAX_RUNTIME:
-            print("⏰ Max runtime reached")
-            break
+    # Classification runs in worker processes so it never competes with fetching for the GIL
+    pool = ProcessPoolExecutor(max_workers=CLASSIFY_WORKERS, initializer=ignore_signals)
+    # Rate and concurrency adapt to how the server responds (see rate_log.jsonl)
+    limiter = AdaptiveLimiter(REQUESTS_PER_SECOND, REQUEST_BURST, max_concurrency=MAX_IN_FLIGHT)
+    # Downloader sessions (connections, consent cookies) are reused across videos and batches
+    source = DownloaderSource(max_threads=MAX_IN_FLIGHT)
+    # Videos with few Tamil comments stop early; what they leave goes to high-yield videos and channels first
+    scheduler = YieldScheduler(MAX_COMMENTS_PER_VIDEO, count_tamil, load_channels(), state.yields())
+    # Per-stage metrics go to metrics.jsonl and metrics.prom while the run is going
+    exporter = MetricsExporter().start()
+    # Ctrl-C, SIGTERM and MAX_RUNTIME stop the run within a few seconds; nothing fetched so far is lost
+    shutdown = Shutdown(deadline=start_time.timestamp() + MAX_RUNTIME.total_seconds()).install()
+
+    # Failed and partial videos come back through next_batch() once their backoff expires
+    batch_num = 0
+    done_before = state.counts().get(DONE, 0)
+    while not shutdown.requested:
+        if queue is not None:
+            queue.refill(state)
+        batch_ids = state.next_batch(BATCH_SIZE, rank=scheduler.rank)
+        if not batch_ids:
+            due = state.next_retry_time()
+            if due is None:
+                break
+            wait = max(0, due - time.time())
+            print(f"⏳ Only retries left, next one in {wait:.0f}s")
+            METRICS.inc("retry_wait_seconds_total", wait)
+            shutdown.sleep(wait)
+            continue
             
-        batch_ids = remaining_ids[i:i+100]
-        batch_count = process_batch(batch_ids, batch_num + 1)
-        
-        with open("processed.log", "a") as f:
-            f.write("\n".join(batch_ids) + "\n")
+        batch_num += 1
+        batch_count = process_batch(batch_ids, state.next_batch_number(output_dir), state, pool, limiter, source,
+                                    scheduler, output_dir, shutdown, archive)
         
         elapsed = datetime.now() - start_time
-        print(f"\nBatch {batch_num+1}/{total_batches} | {batch_count} comments")
-        print(f"Elapsed: {elapsed} | Est. remaining: {elapsed*(total_batches-batch_num-1)/(batch_num+1)}")
-        
-        if (batch_num + 1) % 5 == 0:
-            cooldown = random.randint(30, 60)
-            print(f"🛑 Cooling down for {cooldown}s...")
-            time.sleep(cooldown)
+        counts = state.counts()
+        for status, count in counts.items():
+            METRICS.set("videos", count, status=status)
+        done = counts.get(DONE, 0) - done_before
+        print(f"\nBatch {batch_num} | {batch_count} comments | {counts}")
+        print(scheduler)
+        print(f"Elapsed: {elapsed} | Est. remaining: {elapsed*len(state.remaining())/max(done, 1)}")
     
-    combine_results()
+    pool.shutdown()
+    source.close()
+    print(source.sessions)
+    exporter.stop()
+    if archive is not None:
+        archive.close()
+    state.report_failures(os.path.join(output_dir, FAILED_IDS_FILE) if queue is not None else FAILED_IDS_FILE)
+    if queue is not None:
+        queue.refill(state, claim=False)
+        queue.stop()
+        state.close()
+        # Several workers must not compact at once; the merge is run once, after they finish
+        print("🧩 Worker finished; run `python work.py merge` once every worker is done")
+    else:
+        state.close()
+        if shutdown.signum is None:
+            combine_results(dedupe=args.dedupe)
+        else:
+            print("🧩 Stopped early; run `python compact.py` to combine the batch files")
     print(f"\nTotal runtime: {datetime.now() - start_time}")
+    shutdown.restore()
+    shutdown.exit()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
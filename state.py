@@ -0,0 +1,236 @@
+import json
+import os
+import random
+import re
+import sqlite3
+import time
+from datetime import datetime
+from fetcher import NEWEST_KEPT
+
+PENDING = "pending"
+IN_PROGRESS = "in_progress"
+DONE = "done"
+FAILED = "failed"
+PARTIAL = "partial"
+
+BATCH_FILE_RE = re.compile(r"batch_(\d+)")
+
+# Retry policy for failed / partial videos
+MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = 30       # Seconds before the first retry
+RETRY_MAX_DELAY = 30 * 60   # Backoff cap in seconds
+
+
+def backoff(attempts):
+    """Exponential backoff with jitter for the retry after `attempts` tries"""
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.5)
+
+
+class StateStore:
+    """Per-video scrape state in SQLite (WAL mode), replacing progress.json / processed.log.
+
+    Every update touches a single row, so saving progress costs the same on
+    the first video as on the ten-thousandth."""
+
+    def __init__(self, path):
+        self.path = path
+        # The pipeline's writer thread records outcomes; callers never use the store concurrently
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS videos (
+                video_id     TEXT PRIMARY KEY,
+                status       TEXT NOT NULL,
+                comments     INTEGER NOT NULL DEFAULT 0,
+                last_cid     TEXT,
+                attempts     INTEGER NOT NULL DEFAULT 0,
+                error        TEXT,
+                updated      TEXT,
+                next_attempt REAL NOT NULL DEFAULT 0,
+                seen_cids    TEXT,
+                useful       INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS videos_status ON videos (status);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(videos)")]
+        for column, definition in (("next_attempt", "REAL NOT NULL DEFAULT 0"), ("seen_cids", "TEXT"),
+                                   ("useful", "INTEGER NOT NULL DEFAULT 0")):
+            if column not in columns:
+                self.db.execute(f"ALTER TABLE videos ADD COLUMN {column} {definition}")
+
+    def add(self, video_ids):
+        """Register video IDs as pending; IDs already known keep their state"""
+        with self.db:
+            self.db.executemany("INSERT OR IGNORE INTO videos (video_id, status) VALUES (?, ?)",
+                                ((vid, PENDING) for vid in video_ids))
+
+    def drop(self, video_ids):
+        """Forget the videos among `video_ids` that are not done, e.g. because another worker now owns them"""
+        with self.db:
+            self.db.executemany("DELETE FROM videos WHERE video_id = ? AND status != ?",
+                                ((vid, DONE) for vid in video_ids))
+
+    def remaining(self, max_attempts=MAX_ATTEMPTS):
+        """IDs still to scrape (not done and not permanently failed), in the order they were added"""
+        rows = self.db.execute("SELECT video_id FROM videos WHERE status != ? AND NOT "
+                               "(status IN (?, ?) AND attempts >= ?) ORDER BY rowid",
+                               (DONE, FAILED, PARTIAL, max_attempts))
+        return [row[0] for row in rows]
+
+    def next_batch(self, size, max_attempts=MAX_ATTEMPTS, rank=None):
+        """Next IDs to fetch: retries whose backoff has expired first, then interrupted and pending videos.
+
+        With `rank` (a sort key per video ID), interrupted and pending videos are
+        taken in that order instead of the order they were added."""
+        now = time.time()
+        retries = self.db.execute(
+            "SELECT video_id FROM videos WHERE status IN (?, ?) AND attempts < ? AND next_attempt <= ? "
+            "ORDER BY next_attempt LIMIT ?", (FAILED, PARTIAL, max_attempts, now, size)).fetchall()
+        batch = [row[0] for row in retries]
+        for status in (IN_PROGRESS, PENDING):
+            if rank is None:
+                rows = self.db.execute("SELECT video_id FROM videos WHERE status = ? ORDER BY rowid LIMIT ?",
+                                       (status, size - len(batch)))
+                batch += [row[0] for row in rows]
+            else:
+                rows = self.db.execute("SELECT video_id FROM videos WHERE status = ? ORDER BY rowid", (status,))
+                batch += sorted((row[0] for row in rows), key=rank)[:size - len(batch)]
+        return batch
+
+    def next_retry_time(self, max_attempts=MAX_ATTEMPTS):
+        """Epoch time the earliest waiting retry becomes due, or None if nothing is waiting"""
+        row = self.db.execute("SELECT MIN(next_attempt) FROM videos WHERE status IN (?, ?) AND attempts < ?",
+                              (FAILED, PARTIAL, max_attempts)).fetchone()
+        return row[0]
+
+    def permanently_failed(self, max_attempts=MAX_ATTEMPTS):
+        """(video_id, status, comments, error) for videos that used up their attempts"""
+        return self.db.execute("SELECT video_id, status, comments, error FROM videos "
+                               "WHERE status IN (?, ?) AND attempts >= ? ORDER BY rowid",
+                               (FAILED, PARTIAL, max_attempts)).fetchall()
+
+    def get(self, video_id):
+        """State row for one video as a dict, or None"""
+        cursor = self.db.execute("SELECT * FROM videos WHERE video_id = ?", (video_id,))
+        row = cursor.fetchone()
+        return dict(zip([col[0] for col in cursor.description], row)) if row else None
+
+    def resume_points(self, video_ids):
+        """{video_id: (last_cid, comments, seen_cids)} for videos that stopped partway
+        through or whose newest comments are known from an earlier run"""
+        points = {}
+        for vid in video_ids:
+            row = self.db.execute("SELECT last_cid, comments, seen_cids FROM videos WHERE video_id = ? AND status != ?",
+                                  (vid, DONE)).fetchone()
+            if row and (row[0] or row[2]):
+                points[vid] = (row[0], row[1] if row[0] else 0, tuple((row[2] or "").split()))
+        return points
+
+    def rescan(self):
+        """Queue finished videos again for a "since last run" pass; returns how many.
+
+        Their seen comment IDs are kept, so the fetch stops at what is already stored,
+        and so are their comment totals: finish() adds the new comments to them, and
+        the yield history (yields()) is there for the scheduler from the start.
+        Videos that used up their retries get a fresh set of attempts."""
+        with self.db:
+            count = self.db.execute("UPDATE videos SET status = ?, attempts = 0, "
+                                    "last_cid = NULL, error = NULL, next_attempt = 0 WHERE status = ?",
+                                    (PENDING, DONE)).rowcount
+            self.db.execute("UPDATE videos SET attempts = 0, next_attempt = 0 WHERE status IN (?, ?)",
+                            (FAILED, PARTIAL))
+        return count
+
+    def start(self, video_ids):
+        """Mark videos in progress and count the attempt"""
+        with self.db:
+            self.db.executemany(
+                "UPDATE videos SET status = ?, attempts = attempts + 1, updated = ? WHERE video_id = ?",
+                ((IN_PROGRESS, datetime.now().isoformat(), vid) for vid in video_ids))
+
+    def finish(self, video_id, status, comments=0, last_cid=None, error=None, newest=(), useful=0):
+        """Record the outcome of a fetch once its comments are safely on disk.
+
+        Failed and partial videos get a backoff before next_batch() hands them out again.
+        `newest` (top-level comment IDs, newest first) is merged into the seen IDs;
+        `useful` counts the comments that were kept, for yield-aware scheduling."""
+        with self.db:
+            row = self.db.execute("SELECT attempts, seen_cids FROM videos WHERE video_id = ?", (video_id,)).fetchone()
+            attempts, seen = row if row else (1, None)
+            next_attempt = time.time() + backoff(attempts) if status in (FAILED, PARTIAL) else 0
+            seen = (seen or "").split()
+            seen = " ".join((list(newest) + [cid for cid in seen if cid not in newest])[:NEWEST_KEPT]) or None
+            self.db.execute(
+                "UPDATE videos SET status = ?, comments = comments + ?, useful = useful + ?, "
+                "last_cid = COALESCE(?, last_cid), error = ?, updated = ?, next_attempt = ?, seen_cids = ? "
+                "WHERE video_id = ?",
+                (status, comments, useful, last_cid, error, datetime.now().isoformat(), next_attempt, seen, video_id))
+
+    def checkpoint(self, video_id, comments=0, last_cid=None, newest=(), useful=0):
+        """Record how far a fetch interrupted by a shutdown got, once its comments are on disk.
+
+        The video stays in progress, so next_batch() hands it out first and it
+        resumes after `last_cid`; the interrupted attempt is not counted."""
+        self.finish(video_id, IN_PROGRESS, comments, last_cid, None, newest, useful)
+        with self.db:
+            self.db.execute("UPDATE videos SET attempts = MAX(attempts - 1, 0) WHERE video_id = ?", (video_id,))
+
+    def counts(self):
+        """Number of videos per status"""
+        return dict(self.db.execute("SELECT status, COUNT(*) FROM videos GROUP BY status"))
+
+    def yields(self):
+        """(video_id, comments, useful) for every video fetched so far"""
+        return self.db.execute("SELECT video_id, comments, useful FROM videos WHERE comments > 0").fetchall()
+
+    def next_batch_number(self, output_dir=None):
+        """Batch numbers keep counting across runs, so batch files are never overwritten.
+
+        A new store starts after the highest batch_<n> already in `output_dir`."""
+        with self.db:
+            row = self.db.execute("SELECT value FROM meta WHERE key = 'batch'").fetchone()
+            if row:
+                batch = int(row[0]) + 1
+            else:
+                files = os.listdir(output_dir) if output_dir and os.path.isdir(output_dir) else []
+                existing = [int(m.group(1)) for m in map(BATCH_FILE_RE.match, files) if m]
+                batch = max(existing, default=0) + 1
+            self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('batch', ?)", (str(batch),))
+        return batch
+
+    def import_legacy(self, path):
+        """Mark IDs from an old progress.json or processed.log as done, then rename the file"""
+        if not os.path.exists(path):
+            return 0
+        with open(path) as f:
+            if path.endswith(".json"):
+                try:
+                    done = json.load(f).get("processed_ids", [])
+                except ValueError:
+                    done = []
+            else:
+                done = [line.strip() for line in f if line.strip()]
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO videos (video_id, status) VALUES (?, ?)",
+                                ((vid, DONE) for vid in done))
+        os.replace(path, path + ".imported")
+        print(f"📥 Imported {len(done)} processed IDs from {path}")
+        return len(done)
+
+    def report_failures(self, path, max_attempts=MAX_ATTEMPTS):
+        """Print and save the IDs that failed on every attempt"""
+        failed = self.permanently_failed(max_attempts)
+        if not failed:
+            return []
+        with open(path, "w") as f:
+            f.write("".join(f"{vid}\n" for vid, *_ in failed))
+        print(f"\n❌ {len(failed)} videos failed after {max_attempts} attempts (saved to {path}):")
+        for vid, status, comments, error in failed[:10]:
+            print(f"  {vid} [{status}, {comments} comments] {error}")
+        return [vid for vid, *_ in failed]
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,6 @@
+import os
+import sys
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The scripts live at the top level and the synthetic source in benchmarks/
+sys.path[:0] = [REPO, os.path.join(REPO, "benchmarks")]
@@ -0,0 +1,30 @@
+import os
+from datetime import datetime
+import archive
+import pyarrow.parquet as pq
+from archive import RawArchive, reclassify
+from rescrap import classify_chunk
+
+
+class Clock(datetime):
+    """Stands in for archive.datetime, one second later on every call"""
+    seconds = 0
+
+    @classmethod
+    def now(cls):
+        cls.seconds += 1
+        return datetime(2026, 1, 2, 3, 4, cls.seconds)
+
+
+def test_reruns_on_one_day_keep_earlier_output(tmp_path, monkeypatch):
+    store = RawArchive(str(tmp_path / "archive"))
+    store.add("video", [{"cid": "a", "text": "semma padam anna"}, {"cid": "b", "text": "வேற லெவல்"}])
+    output = str(tmp_path / "reclassified")
+    monkeypatch.setattr(archive, "datetime", Clock)
+    for _ in range(2):
+        reclassify(store, classify_chunk, output, workers=1)
+    store.close()
+    files = sorted(os.listdir(output))
+    assert files == ["batch_reclassified_rescrap_030401_20260102.parquet",
+                     "batch_reclassified_rescrap_030402_20260102.parquet"]
+    assert all(pq.read_table(os.path.join(output, name)).num_rows == 2 for name in files)
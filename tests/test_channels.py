@@ -0,0 +1,34 @@
+import os
+from channels import FixtureServer, VideoIndex, fetch_channel_ids
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "channel")
+PAGES = [[f"TestVid{page}{i:03d}" for i in range(1, 4)] for page in range(1, 4)]
+
+
+def enumerate_channel(tmp_path, known=(), full=False):
+    ids_file = str(tmp_path / "all_video_ids.txt")
+    with open(ids_file, "w") as f:
+        f.write("".join(f"{vid}\n" for vid in known))
+    with FixtureServer(FIXTURES) as base_url:
+        added = fetch_channel_ids(["@testchannel"], full, base_url=base_url, index_file=str(tmp_path / "index.db"),
+                                  ids_file=ids_file)
+    return added.get("@testchannel")
+
+
+def test_reads_every_continuation_page(tmp_path):
+    assert enumerate_channel(tmp_path) == PAGES[0] + PAGES[1] + PAGES[2]
+    index = VideoIndex(str(tmp_path / "index.db"), None)
+    assert set(index.channels().values()) == {"/@testchannel/videos"}
+    index.close()
+    # A second run finds the newest video indexed and stops on the first page
+    assert enumerate_channel(tmp_path, PAGES[0] + PAGES[1] + PAGES[2]) == []
+
+
+def test_stops_at_the_first_page_with_a_known_id(tmp_path):
+    # The last page is never requested, so none of its videos are listed
+    assert enumerate_channel(tmp_path, ["TestVid2002"]) == PAGES[0] + ["TestVid2001", "TestVid2003"]
+
+
+def test_full_reads_past_known_ids(tmp_path):
+    expected = PAGES[0] + ["TestVid2001", "TestVid2003"] + PAGES[2]
+    assert enumerate_channel(tmp_path, ["TestVid2002"], full=True) == expected
@@ -0,0 +1,40 @@
+import os
+import comment_index
+from comment_index import CommentIndex, build, load_manifest
+
+
+def add_batch(number, rows):
+    os.makedirs("comment_data", exist_ok=True)
+    with open(os.path.join("comment_data", f"batch_{number}.csv"), "w") as f:
+        f.write("video_id,text,type\n" + "".join(f"vid{number:08d},semma comment {number} {i},tanglish\n"
+                                                  for i in range(rows)))
+
+
+def test_appends_never_rewrite_the_base_segment(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(comment_index, "TIER_ROWS", 10)
+    add_batch(0, 1000)
+    build()
+    base = load_manifest()["segments"][0]
+    for number in range(1, 40):
+        add_batch(number, 5)
+        build()
+        # Small segments merge among themselves; the 1000-row segment stays as it was
+        assert load_manifest()["segments"][0] == base
+    manifest = load_manifest()
+    assert len(manifest["segments"]) < 2 + 3 * (comment_index.MERGE_FACTOR - 1)
+    assert sorted(os.listdir("comment_index")) == sorted(manifest["segments"] + ["_manifest.json"])
+    index = CommentIndex()
+    assert len(index) == 1000 + 39 * 5
+    assert index.count('"semma comment 7"') == 5
+
+
+def test_build_indexes_worker_shards(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    add_batch(0, 3)
+    os.makedirs(os.path.join("work", "shards", "w1"))
+    with open(os.path.join("work", "shards", "w1", "batch_1.csv"), "w") as f:
+        f.write("video_id,text,type\nvid00000001,vera level from a worker,tanglish\n")
+    assert build() == 4
+    assert CommentIndex().count('"vera level"') == 1
+    assert build() == 0
@@ -0,0 +1,26 @@
+import os
+import pytest
+import export
+
+
+def test_failed_export_leaves_no_tmp_file(tmp_path, monkeypatch):
+    source = tmp_path / "batch_1.csv"
+    source.write_text("video_id,text,type\nabc,semma,tanglish\n")
+
+    def broken(*args, **kwargs):
+        yield from ()
+        raise OSError("disk full")
+
+    monkeypatch.setattr(export, "read_batches", broken)
+    output = tmp_path / "out.csv"
+    with pytest.raises(OSError):
+        export.export(str(output), [str(source)])
+    assert os.listdir(tmp_path) == ["batch_1.csv"]
+
+
+def test_export_writes_the_output(tmp_path):
+    source = tmp_path / "batch_1.csv"
+    source.write_text("video_id,text,type\nabc,semma,tanglish\n")
+    rows, files = export.export(str(tmp_path / "out.csv"), [str(source)], columns=["video_id", "text"])
+    assert (rows, files) == (1, 1)
+    assert sorted(os.listdir(tmp_path)) == ["batch_1.csv", "out.csv"]
@@ -0,0 +1,101 @@
+import asyncio
+from fetcher import TokenBucket, fetch_video
+
+
+class PagedSource:
+    """Serves `cids` as comment dicts, `page_size` per page"""
+
+    def __init__(self, cids, page_size=2):
+        self.cids = cids
+        self.page_size = page_size
+
+    async def pages(self, video_id):
+        for start in range(0, len(self.cids), self.page_size):
+            yield [{"cid": cid, "text": cid} for cid in self.cids[start:start + self.page_size]]
+
+
+def fetch(cids, resume_after, max_comments=100):
+    comments, newest = [], []
+    asyncio.run(fetch_video("video", PagedSource(cids), TokenBucket(1000, 1000), max_comments, comments,
+                            resume_after=resume_after, newest=newest))
+    return [comment["cid"] for comment in comments], newest
+
+
+def test_resume_skips_up_to_the_anchor():
+    assert fetch(["a", "b", "c", "c.r1", "d"], "b")[0] == ["c", "c.r1", "d"]
+
+
+def test_deleted_anchor_keeps_the_video_from_the_top():
+    # "b" was the last comment stored, then deleted: nothing after it may be lost
+    cids, newest = fetch(["a", "c", "c.r1", "d"], "b")
+    assert cids == ["a", "c", "c.r1", "d"]
+    assert newest == ["a", "c", "d"]
+    assert fetch(["a", "c", "d"], "b", max_comments=2)[0] == ["a", "c"]
+
+
+def test_resumed_video_stays_within_the_scheduler_budget():
+    from scheduler import YieldScheduler
+
+    scheduler = YieldScheduler(10, len)  # Every comment useful; a budget of 10 per video
+    cids = [f"c{i}" for i in range(40)]
+    comments = []
+    # 8 comments were stored by an interrupted attempt that stopped after c7
+    asyncio.run(fetch_video("video", PagedSource(cids), TokenBucket(1000, 1000), scheduler.limit - 8, comments,
+                            resume_after="c7", scheduler=scheduler, fetched=8))
+    assert [comment["cid"] for comment in comments] == ["c8", "c9"]
+
+
+def test_adaptive_limiter_backs_off_when_throttled_and_recovers():
+    from fetcher import AdaptiveLimiter, FakeSource, ThrottledError, ThrottlingFakeSource, fetch_batch
+
+    limiter = AdaptiveLimiter(rate=100, burst=100, max_rate=200, log_file=None)
+    errors = []
+    fetch_batch(["a", "b"], lambda vid, comments, error, newest: errors.append(error), 1000,
+                source=ThrottlingFakeSource(capacity=5, comments_per_video=200, latency=(0, 0)), limiter=limiter)
+    assert any(isinstance(error, ThrottledError) for error in errors)
+    backed_off = limiter.rate
+    assert backed_off < 100
+
+    fetch_batch(["c"], lambda *result: None, 1000, source=FakeSource(comments_per_video=800, latency=(0, 0)),
+                limiter=limiter)
+    assert limiter.rate > backed_off
+
+
+def test_downloader_source_raises_on_a_429():
+    import requests
+    from fetcher import DownloaderSource, SessionPool, ThrottledError
+
+    class Busy(requests.adapters.BaseAdapter):
+        def send(self, request, **kwargs):
+            response = requests.Response()
+            response.status_code, response.url, response.request = 429, request.url, request
+            return response
+
+        def close(self):
+            pass
+
+    class Downloader:
+        """Retries like youtube_comment_downloader, which ends the stream once it gives up"""
+
+        def __init__(self):
+            self.session = requests.Session()
+            self.session.mount("https://", Busy())
+
+        def get_comments(self, video_id, sleep=0):
+            for _ in range(3):
+                if self.session.post("https://www.youtube.com/youtubei/v1/next").status_code == 200:
+                    yield {"cid": "a", "text": "a"}
+                    return
+
+    async def first_page():
+        async for page in source.pages("video"):
+            return page
+
+    source = DownloaderSource(page_size=2, max_threads=1, sessions=SessionPool(factory=Downloader))
+    try:
+        asyncio.run(first_page())
+        raise AssertionError("no ThrottledError")
+    except ThrottledError:
+        pass
+    finally:
+        source.close()
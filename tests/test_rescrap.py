@@ -0,0 +1,24 @@
+import rescrap
+from archive import RawArchive
+from fetcher import DownloaderSource, SessionPool
+from state import StateStore, DONE
+from synthetic import fake_downloader, synthetic_corpus, video_ids
+
+
+def test_process_batch_archives_every_fetch(tmp_path, monkeypatch):
+    monkeypatch.setattr(rescrap, "OUTPUT_DIR", str(tmp_path / "comment_data"))
+    ids = video_ids(5)
+    state = StateStore(str(tmp_path / "progress.db"))
+    state.add(ids)
+    archive = RawArchive(str(tmp_path / "raw_archive"))
+    source = DownloaderSource(sessions=SessionPool(factory=fake_downloader(synthetic_corpus(500), 50, 10)))
+    try:
+        rows = rescrap.process_batch(ids, 1, state, source=source, archive=archive)
+        stats = archive.stats()
+        assert stats["videos"] == 5 and stats["fetches"] == 5 and stats["comments"] == 250
+        assert rows == 250
+        assert state.counts() == {DONE: 5}
+    finally:
+        source.close()
+        archive.close()
+        state.close()
@@ -0,0 +1,38 @@
+from state import StateStore, DONE, PENDING
+
+
+def test_rescan_keeps_comment_totals(tmp_path):
+    state = StateStore(str(tmp_path / "processed.db"))
+    state.add(["a" * 11, "b" * 11])
+    state.start(["a" * 11, "b" * 11])
+    state.finish("a" * 11, DONE, comments=400, newest=["c1"], useful=300)
+    state.finish("b" * 11, DONE, comments=100, newest=["c9"], useful=5)
+
+    assert state.rescan() == 2
+    assert state.counts() == {PENDING: 2}
+    assert state.get("a" * 11)["comments"] == 400
+    # An incremental pass adds what it found to the totals
+    state.start(["a" * 11])
+    state.finish("a" * 11, DONE, comments=7, newest=["c0"], useful=6)
+    assert state.get("a" * 11)["comments"] == 407 and state.get("a" * 11)["useful"] == 306
+    state.close()
+
+
+def test_since_last_run_ranks_by_yield_history(tmp_path):
+    from scheduler import YieldScheduler
+
+    state = StateStore(str(tmp_path / "processed.db"))
+    high, low = "h" * 11, "l" * 11
+    state.add([high, low])
+    state.start([high, low])
+    state.finish(high, DONE, comments=400, useful=360)
+    state.finish(low, DONE, comments=400, useful=8)
+    state.rescan()
+
+    assert sorted(state.yields()) == [(high, 400, 360), (low, 400, 8)]
+    channels = {high: "tamil_channel", low: "english_channel"}
+    scheduler = YieldScheduler(500, len, channels, state.yields())
+    # High-yield channels are served first on the incremental pass too
+    assert state.next_batch(2, rank=scheduler.rank) == [high, low]
+    assert scheduler.prior(high) > 0.8 and scheduler.prior(low) < 0.1
+    state.close()
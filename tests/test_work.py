@@ -0,0 +1,69 @@
+import json
+import os
+import subprocess
+import sys
+from work import WorkQueue
+
+
+def plan(root, count=300):
+    queue = WorkQueue(str(root), worker="planner")
+    queue.plan([f"video{i:06d}" for i in range(count)])
+
+
+def test_default_workers_on_one_host_lease_different_chunks(tmp_path):
+    plan(tmp_path)
+    # Two scra.py --work-dir processes on one host, without --worker; each keeps its lease
+    claim = ("import sys, time; from work import WorkQueue; "
+             f"lease = WorkQueue({str(tmp_path)!r}).claim(); print(lease.chunk, flush=True); time.sleep(5)")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    workers = [subprocess.Popen([sys.executable, "-c", claim], stdout=subprocess.PIPE, text=True, env=env)
+               for _ in range(2)]
+    try:
+        chunks = [worker.stdout.readline().strip() for worker in workers]
+    finally:
+        for worker in workers:
+            worker.kill()
+            worker.wait()
+    assert chunks[0] and chunks[1] and chunks[0] != chunks[1]
+
+
+def test_same_name_never_takes_a_live_processes_lease(tmp_path):
+    plan(tmp_path)
+    other = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        queue = WorkQueue(str(tmp_path), worker="w1")
+        lease = queue.claim()
+        # The same worker name held by another live process on this host
+        path = os.path.join(str(tmp_path), "leases", f"{lease.chunk}.json")
+        with open(path) as f:
+            data = json.load(f)
+        data["pid"] = other.pid
+        with open(path, "w") as f:
+            json.dump(data, f)
+        restarted = WorkQueue(str(tmp_path), worker="w1")
+        assert restarted.claim().chunk != lease.chunk
+        assert not queue.renew(lease) and lease.lost
+    finally:
+        other.kill()
+        other.wait()
+    # Once that process is gone its lease can be taken back at once
+    assert WorkQueue(str(tmp_path), worker="w1")._take(path)
+
+
+def test_lost_chunk_leaves_the_workers_state(tmp_path):
+    from state import DONE, StateStore
+
+    plan(tmp_path)
+    queue = WorkQueue(str(tmp_path), worker="w1", lease_seconds=0)
+    state = StateStore(str(tmp_path / "progress.db"))
+    assert queue.refill(state)
+    lease = queue.leases[0]
+    state.finish(lease.video_ids[0], DONE, comments=3)
+    # The lease expired and another worker took the chunk over
+    assert WorkQueue(str(tmp_path), worker="w2").claim().chunk == lease.chunk
+    assert not queue.renew(lease)
+    assert queue.refill(state)
+    assert [held.chunk for held in queue.leases] != [lease.chunk]
+    assert state.get(lease.video_ids[0])["status"] == DONE
+    assert not any(vid in lease.video_ids for vid in state.next_batch(1000))
+    state.close()
@@ -0,0 +1,322 @@
+"""Share all_video_ids.txt between scra.py workers, on one host or several sharing a filesystem
+
+    python scra.py --work-dir /shared/work [--worker NAME]   # start as many as you like, anywhere
+    python work.py status [--work-dir /shared/work]
+    python work.py merge [--work-dir /shared/work] [--by-date]  # once the chunks are done
+
+Video IDs are split into chunks of CHUNK_SIZE under <work-dir>/chunks/. A
+worker leases one chunk at a time by creating <work-dir>/leases/<chunk>.json
+(an atomic create, so two workers never get the same chunk) and renews it
+every HEARTBEAT seconds while it works. A lease that has not been renewed for
+LEASE_SECONDS, e.g. because its worker crashed, can be taken over by anyone.
+A lease records its worker's host and pid: a worker started again under the
+same --worker name takes its old leases back at once if that process is gone,
+but never one a live process holds. Without --worker, each process is named
+<host>-<pid>.
+A finished chunk gets a marker in <work-dir>/done/.
+
+Each worker writes its batch files to <work-dir>/shards/<worker>/, so the
+merge, run on any host, sees every worker's results. Its state store and
+--archive stay on local disk in comment_data/workers/<worker>/: both are
+SQLite databases in WAL mode, which relies on shared memory and file locks
+that network filesystems (NFS, SMB) do not provide reliably, so never point
+them at the shared directory. A chunk taken over from a crashed or stalled
+worker may be scraped twice, so the merge drops comments whose ID is already
+in the dataset. Lease times come from each host's clock, so keep the hosts'
+clocks in sync (NTP).
+"""
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime
+from compact import combine_results, OUTPUT_DIR
+from state import PENDING, IN_PROGRESS
+
+# Configuration
+WORK_DIR = "work"
+SHARDS = "shards"         # Per-worker batch files, under the work directory
+STATE_DIR = os.path.join(OUTPUT_DIR, "workers")  # Per-worker state store and archive, on local disk
+CHUNK_SIZE = 100          # Videos per leased chunk
+LEASE_SECONDS = 15 * 60   # A lease not renewed for this long is free to take over
+HEARTBEAT = 60            # Seconds between lease renewals
+
+
+def _write_json(path, data):
+    """Replace `path` atomically"""
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _create_json(path, data):
+    """Create `path` only if it does not exist; True if this call created it.
+
+    The file is written under a unique name and hard-linked into place, which is
+    atomic on local filesystems and on NFS alike."""
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    try:
+        os.link(tmp, path)
+        return True
+    except FileExistsError:
+        return False
+    finally:
+        os.remove(tmp)
+
+
+def _alive(pid):
+    """Whether a process with this pid is running on this host"""
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Someone else's process
+    return True
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class Lease:
+    """A chunk of video IDs held by this worker"""
+
+    def __init__(self, chunk, video_ids):
+        self.chunk = chunk
+        self.video_ids = video_ids
+        self.lost = False
+
+    def __repr__(self):
+        return f"Lease({self.chunk}, {len(self.video_ids)} videos)"
+
+
+class WorkQueue:
+    """Chunks of video IDs leased to workers through files in a shared directory"""
+
+    def __init__(self, root=WORK_DIR, worker=None, lease_seconds=LEASE_SECONDS, heartbeat=HEARTBEAT):
+        self.root = root
+        # The host name alone is not enough: two processes on one host would share leases and a shard
+        self.worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self.heartbeat = heartbeat
+        self.leases = []
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+        for name in ("chunks", "leases", "done"):
+            os.makedirs(os.path.join(root, name), exist_ok=True)
+
+    def _path(self, kind, chunk):
+        return os.path.join(self.root, kind, f"{chunk}.{'txt' if kind == 'chunks' else 'json'}")
+
+    def chunks(self):
+        return sorted(name[:-4] for name in os.listdir(os.path.join(self.root, "chunks")) if name.endswith(".txt"))
+
+    def chunk_ids(self, chunk):
+        with open(self._path("chunks", chunk)) as f:
+            return [line.strip() for line in f if line.strip()]
+
+    def plan(self, video_ids, chunk_size=CHUNK_SIZE):
+        """Add chunks for IDs not in any chunk yet (every worker calls this; new IDs can arrive between runs)"""
+        while not self._take(os.path.join(self.root, "plan.json")):
+            time.sleep(0.5)
+        try:
+            planned = {vid for chunk in self.chunks() for vid in self.chunk_ids(chunk)}
+            new_ids = list(dict.fromkeys(vid for vid in video_ids if vid not in planned))
+            number = len(self.chunks())
+            for start in range(0, len(new_ids), chunk_size):
+                number += 1
+                path = self._path("chunks", f"chunk_{number:05d}")
+                with open(path + ".tmp", "w") as f:
+                    f.write("".join(f"{vid}\n" for vid in new_ids[start:start + chunk_size]))
+                os.replace(path + ".tmp", path)
+            return (len(new_ids) + chunk_size - 1) // chunk_size
+        finally:
+            os.remove(os.path.join(self.root, "plan.json"))
+
+    def _held(self, lease):
+        """Whether lease data (as read from a lease file) belongs to this process"""
+        return (lease.get("worker") == self.worker and lease.get("host") == socket.gethostname()
+                and lease.get("pid") == os.getpid())
+
+    def _reclaimable(self, lease):
+        """Whether lease data can be taken: expired, ours, or left by a dead process under our name on this host"""
+        if lease.get("expires", 0) < time.time() or self._held(lease):
+            return True
+        return (lease.get("worker") == self.worker and lease.get("host") == socket.gethostname()
+                and not _alive(lease.get("pid", 0)))
+
+    def _take(self, path):
+        """Create the lease file at `path` for this worker, taking it over if it expired or is already ours"""
+        lease = {"worker": self.worker, "host": socket.gethostname(), "pid": os.getpid(),
+                 "expires": time.time() + self.lease_seconds}
+        if _create_json(path, lease):
+            return True
+        current = _read_json(path)
+        if current is None or self._reclaimable(current):
+            if current is not None and current.get("worker") != self.worker:
+                print(f"⏱️ Taking over {os.path.basename(path)} from {current.get('worker')} (lease expired)")
+            # Only one of several workers can rename the old lease away; the others lose the race
+            stale = f"{path}.{uuid.uuid4().hex}.stale"
+            try:
+                os.rename(path, stale)
+            except FileNotFoundError:
+                return False
+            taken = _read_json(stale)
+            if taken is not None and not self._reclaimable(taken):
+                # Renewed or taken over by someone else since it was read: put it back
+                try:
+                    os.link(stale, path)
+                except FileExistsError:
+                    pass
+                os.remove(stale)
+                return False
+            os.remove(stale)
+            return _create_json(path, lease)
+        return False
+
+    def claim(self):
+        """Lease the next chunk that is neither done nor held by a live worker; None when there is none"""
+        held = {lease.chunk for lease in self.leases}
+        for chunk in self.chunks():
+            if chunk in held or os.path.exists(self._path("done", chunk)):
+                continue
+            if self._take(self._path("leases", chunk)):
+                lease = Lease(chunk, self.chunk_ids(chunk))
+                with self.lock:
+                    self.leases.append(lease)
+                return lease
+        return None
+
+    def renew(self, lease):
+        """Push the lease's expiry back; False (and lease.lost) if another worker has taken it over"""
+        path = self._path("leases", lease.chunk)
+        current = _read_json(path)
+        if current is None or not self._held(current):
+            lease.lost = True
+            return False
+        current["expires"] = time.time() + self.lease_seconds
+        _write_json(path, current)
+        return True
+
+    def complete(self, lease):
+        """Mark the chunk done and give up the lease"""
+        _create_json(self._path("done", lease.chunk), {"worker": self.worker, "finished": datetime.now().isoformat()})
+        self.release(lease)
+
+    def release(self, lease):
+        """Give up a lease without finishing the chunk, so another worker can take it"""
+        with self.lock:
+            if lease in self.leases:
+                self.leases.remove(lease)
+        path = self._path("leases", lease.chunk)
+        if self._held(_read_json(path) or {}):
+            os.remove(path)
+
+    def refill(self, state, claim=True):
+        """Complete held chunks whose videos have all been tried, and (with `claim`) lease a new chunk once
+        none are left to start. Videos waiting for a retry stay in the worker's own state. A chunk whose
+        lease was lost is dropped from the state, apart from the videos already done, since the worker that
+        took it over fetches the rest. Returns False once nothing is left."""
+        for lease in list(self.leases):
+            if lease.lost:
+                print(f"⚠️ Lost the lease on {lease.chunk}; another worker has taken it over")
+                state.drop(lease.video_ids)
+                with self.lock:
+                    self.leases.remove(lease)
+            elif not any((state.get(vid) or {}).get("status") in (PENDING, IN_PROGRESS) for vid in lease.video_ids):
+                self.complete(lease)
+        if self.leases or not claim:
+            return bool(self.leases)
+        lease = self.claim()
+        if lease is None:
+            return False
+        state.add(lease.video_ids)
+        print(f"📋 Leased {lease.chunk} ({len(lease.video_ids)} videos)")
+        return True
+
+    def _run(self):
+        while not self.stopped.wait(self.heartbeat):
+            with self.lock:
+                leases = list(self.leases)
+            for lease in leases:
+                try:
+                    self.renew(lease)
+                except OSError as e:
+                    print(f"⚠️ Could not renew {lease.chunk}: {str(e)}")
+
+    def start(self):
+        """Renew held leases in the background every `heartbeat` seconds"""
+        self.thread = threading.Thread(target=self._run, name="lease-heartbeat", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop renewing and give back any chunk that is not finished"""
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        for lease in list(self.leases):
+            self.release(lease)
+
+    def shard_dir(self):
+        """Where this worker writes its batch files, on the shared filesystem"""
+        return os.path.join(self.root, SHARDS, self.worker)
+
+    def state_dir(self):
+        """Where this worker keeps its SQLite state store and archive, on local disk"""
+        return os.path.join(STATE_DIR, self.worker)
+
+    def status(self):
+        """{"chunks", "done", "leased", "expired", "free"} counts, plus the live lease holders"""
+        now = time.time()
+        counts = {"chunks": 0, "done": 0, "leased": 0, "expired": 0, "free": 0}
+        holders = {}
+        for chunk in self.chunks():
+            counts["chunks"] += 1
+            lease = _read_json(self._path("leases", chunk))
+            if os.path.exists(self._path("done", chunk)):
+                counts["done"] += 1
+            elif lease is None:
+                counts["free"] += 1
+            elif lease["expires"] < now:
+                counts["expired"] += 1
+            else:
+                counts["leased"] += 1
+                holders.setdefault(lease["worker"], []).append(chunk)
+        return counts, holders
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("status", "merge"))
+    parser.add_argument("--work-dir", default=WORK_DIR)
+    parser.add_argument("--by-date", action="store_true", help="merge: also partition by batch date")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        counts, holders = WorkQueue(args.work_dir, worker="status").status()
+        print(f"📋 {counts['done']}/{counts['chunks']} chunks done | {counts['leased']} leased, "
+              f"{counts['expired']} expired, {counts['free']} free")
+        for worker, chunks in sorted(holders.items()):
+            print(f"  {worker}: {', '.join(chunks)}")
+    else:
+        # Shards are compacted along with comment_data/; duplicates are dropped
+        combine_results(by_date=args.by_date, dedupe=True, sources=[os.path.join(args.work_dir, SHARDS)])
+
+
+if __name__ == "__main__":
+    main()
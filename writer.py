@@ -0,0 +1,143 @@
+import os
+import time
+from datetime import datetime, timedelta
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Configuration
+ROW_GROUP_SIZE = 10_000  # Buffered comments before a row group is appended
+COMPRESSION = "zstd"     # zstd / snappy / gzip / lz4 / none (see benchmarks/bench_parquet.py)
+COMPRESSION_LEVEL = None # Codec default; zstd accepts 1-22, gzip 1-9
+
+# Batch files: repeated values are dictionary-encoded, times are native timestamps
+BATCH_SCHEMA = pa.schema([
+    ("video_id", pa.dictionary(pa.int32(), pa.string())),
+    ("comment_id", pa.string()),
+    ("text", pa.string()),
+    ("type", pa.dictionary(pa.int8(), pa.string())),
+    ("published", pa.timestamp("us")),   # Comment publish time (approximate, from YouTube's "2 days ago")
+    ("timestamp", pa.timestamp("us")),   # When the comment was scraped
+])
+
+
+def _local_time(parsed):
+    # Same local wall-clock time as the scrape timestamp (datetime.now())
+    return datetime.fromtimestamp(parsed) if parsed is not None else None
+
+
+def comment_table(video_id, comments, types, scraped=None):
+    """One video's comments as a BATCH_SCHEMA table, built column by column.
+
+    Comments whose type is None are left out; `scraped` (a datetime) fills the
+    timestamp column, which stays null without it."""
+    keep = [i for i, type_name in enumerate(types) if type_name is not None]
+    comments = [comments[i] for i in keep]
+    n = len(comments)
+    type_codes = pa.array([types[i] for i in keep], pa.string()).dictionary_encode()
+    return pa.Table.from_arrays([
+        pa.DictionaryArray.from_arrays(pa.array(np.zeros(n, dtype=np.int32)), pa.array([video_id], pa.string())),
+        pa.array([comment.get('cid') for comment in comments], pa.string()),
+        pa.array([comment['text'].strip() for comment in comments], pa.string()),
+        pa.DictionaryArray.from_arrays(type_codes.indices.cast(pa.int8()), type_codes.dictionary),
+        pa.array([_local_time(comment.get('time_parsed')) for comment in comments], pa.timestamp("us")),
+        pa.array([scraped] * n, pa.timestamp("us")),
+    ], schema=BATCH_SCHEMA)
+
+
+class StreamingParquetWriter:
+    """Append comments to a Parquet file row group by row group as videos finish.
+
+    Memory holds at most one row group. Files are written under a .tmp name and
+    renamed into place on close, and a new part file is started every
+    `save_interval` so a crash only loses the part that was still open. Without
+    a `schema`, column types come from the first rows written."""
+
+    def __init__(self, path, row_group_size=ROW_GROUP_SIZE, save_interval=None, compression=COMPRESSION,
+                 compression_level=COMPRESSION_LEVEL, schema=None):
+        self.path = path
+        self.row_group_size = row_group_size
+        if isinstance(save_interval, timedelta):
+            save_interval = save_interval.total_seconds()
+        self.save_interval = save_interval
+        self.compression = compression
+        self.compression_level = compression_level
+        self.schema = schema
+        self.tables = []
+        self.buffered = 0
+        self.commits = []
+        self.writer = None
+        self.started = None
+        self.part = 1
+        self.paths = []
+        self.count = 0
+
+    def _part_path(self):
+        if self.part == 1:
+            return self.path
+        stem, ext = os.path.splitext(self.path)
+        return f"{stem}_part{self.part}{ext}"
+
+    def write(self, rows, commit=None):
+        """Buffer a finished video's rows (dicts or an Arrow table), flushing on the size or time threshold.
+
+        `commit` is called once these rows are in a closed, renamed file."""
+        if commit is not None:
+            self.commits.append(commit)
+        if isinstance(rows, pa.Table):
+            self.write_table(rows)
+        elif rows:
+            self.write_table(pa.Table.from_pylist(rows, schema=self.schema))
+
+    def write_table(self, table):
+        """Buffer an Arrow table, flushing on the size or time threshold"""
+        if table.num_rows == 0:
+            return
+        if self.schema is None:
+            self.schema = table.schema
+        if self.started is None:
+            self.started = time.monotonic()
+        self.tables.append(table.select(self.schema.names).cast(self.schema))
+        self.buffered += table.num_rows
+        self.count += table.num_rows
+
+        if self.buffered >= self.row_group_size:
+            self.flush()
+        if self.save_interval is not None and time.monotonic() - self.started >= self.save_interval:
+            self.roll()
+
+    def flush(self):
+        """Append buffered rows to the open file as one row group"""
+        if not self.tables:
+            return
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self._part_path() + ".tmp", self.schema, compression=self.compression,
+                                           compression_level=self.compression_level)
+        # One dictionary per column per row group, rather than one per video
+        self.writer.write_table(pa.concat_tables(self.tables).unify_dictionaries().combine_chunks(),
+                                row_group_size=self.buffered)
+        self.tables = []
+        self.buffered = 0
+
+    def roll(self):
+        """Close the current file so everything written so far survives a crash"""
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+            os.replace(self._part_path() + ".tmp", self._part_path())
+            self.paths.append(self._part_path())
+            self.writer = None
+            self.started = None
+            self.part += 1
+        commits, self.commits = self.commits, []
+        for commit in commits:
+            commit()
+
+    def close(self):
+        self.roll()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()